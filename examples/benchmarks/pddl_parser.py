@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+# This script measures the throughput of the PDDL (Lisp) parser used by
+# machetli.pddl.generate_initial_state. It parses the given PDDL files, or,
+# if no files are given, a generated problem with a large initial state.
+#
+#   ./pddl_parser.py [file.pddl ...] [--num-facts N] [--repetitions N]
+
+import argparse
+import io
+from pathlib import Path
+import time
+
+from machetli.pddl.downward.pddl_parser import lisp_parser
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Measure the throughput of the PDDL parser.")
+    parser.add_argument("files", nargs="*", help="PDDL files to parse")
+    parser.add_argument("--num-facts", type=int, default=500000,
+                        help="number of init facts of the generated problem "
+                             "if no files are given")
+    parser.add_argument("--repetitions", type=int, default=3,
+                        help="number of times each file is parsed")
+    return parser.parse_args()
+
+
+def generate_problem(num_facts):
+    lines = ["(define (problem generated) (:domain generated)",
+             "  (:objects"]
+    num_objects = max(2, int(num_facts ** 0.5))
+    lines += [f"    obj{i} - object" for i in range(num_objects)]
+    lines += ["  )", "  (:init"]
+    for i in range(num_facts):
+        lines.append(f"    (connected obj{i % num_objects} "
+                     f"obj{(i // num_objects) % num_objects}) ; fact {i}")
+    lines += ["  )", "  (:goal (and (connected obj0 obj1)))", ")"]
+    return "\n".join(lines) + "\n"
+
+
+def measure(name, text, repetitions):
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        tokens = lisp_parser.tokenize(io.StringIO(text))
+    tokenize_time = (time.perf_counter() - start) / repetitions
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        lisp_parser.parse_nested_list(io.StringIO(text))
+    parse_time = (time.perf_counter() - start) / repetitions
+    megabytes = len(text) / 2**20
+    print(f"{name}: {megabytes:.1f} MiB, {len(tokens)} tokens, "
+          f"tokenize {tokenize_time:.3f}s, parse {parse_time:.3f}s "
+          f"({megabytes / parse_time:.1f} MiB/s)")
+
+
+def main():
+    args = parse_args()
+    if args.files:
+        for filename in args.files:
+            text = Path(filename).read_text(encoding="ISO-8859-1")
+            measure(filename, text, args.repetitions)
+    else:
+        measure(f"generated problem with {args.num_facts} facts",
+                generate_problem(args.num_facts), args.repetitions)
+
+
+if __name__ == "__main__":
+    main()
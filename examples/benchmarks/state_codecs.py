@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+# This script compares the state codecs of machetli.state_codecs on a
+# SAS+ file given on the command line. For regular and compact tasks, it
+# reports how long it takes to write and read the state and how large the
+# resulting file is, both without compression and with gzip compression.
+#
+#   ./state_codecs.py path/to/output.sas [--repetitions N]
+
+import argparse
+from pathlib import Path
+import tempfile
+import time
+
+from machetli import sas, tools
+from machetli.state_codecs import PickleCodec, OutOfBandPickleCodec, SASCodec
+
+
+CODECS = [PickleCodec(), OutOfBandPickleCodec(), SASCodec()]
+COMPRESSIONS = [None, "gz"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Compare write and read times and file sizes of state "
+                    "codecs on a SAS+ task.")
+    parser.add_argument("sas_file", help="SAS+ file to benchmark with")
+    parser.add_argument("--repetitions", type=int, default=5,
+                        help="number of times each state is written and read")
+    return parser.parse_args()
+
+
+def measure(state, path, repetitions):
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        tools.write_state(state, path)
+    write_time = (time.perf_counter() - start) / repetitions
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        tools.read_state(path)
+    read_time = (time.perf_counter() - start) / repetitions
+    return write_time, read_time, path.stat().st_size
+
+
+def main():
+    args = parse_args()
+    print(f"{'task':<8} {'codec':<22} {'write [s]':>10} {'read [s]':>10} "
+          f"{'size [KiB]':>11}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for compact in [False, True]:
+            state = sas.generate_initial_state(args.sas_file, compact=compact)
+            for codec in CODECS:
+                for compression in COMPRESSIONS:
+                    filename = "state" + codec.suffix
+                    if compression:
+                        filename += "." + compression
+                    write_time, read_time, size = measure(
+                        state, Path(tmp_dir, filename), args.repetitions)
+                    print(f"{'compact' if compact else 'regular':<8} "
+                          f"{filename:<22} {write_time:>10.4f} "
+                          f"{read_time:>10.4f} {size / 1024:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+# In this example, we check that the pure-Python and the vectorized validation
+# of compact SAS+ tasks agree. We corrupt random entries of the integer arrays
+# of a task and make sure that both implementations report the same first
+# violation. The vectorized checks require NumPy.
+
+import argparse
+import copy
+import random
+import sys
+
+from machetli import sas
+from machetli.sas.constants import KEY_IN_STATE
+from machetli.sas.validation import numpy, validate_compact_task
+from machetli.tools import get_script_dir
+
+if numpy is None:
+    sys.exit("Install NumPy to compare the vectorized validation.")
+
+# Offsets are not corrupted because invalid offsets make the arrays
+# inconsistent, which the validation does not check.
+FIELDS = ["ranges", "axiom_layers", "mutex_facts", "init", "goal_facts",
+          "operator_costs", "prevail_facts", "effects",
+          "effect_condition_facts", "axiom_condition_facts", "axiom_effects"]
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "sas_file", nargs="?",
+    default=get_script_dir().parents[1] / "use-cases" /
+    "segmentation-fault_sas" / "output_petri_sokobanp01.sas")
+parser.add_argument("--runs", type=int, default=1000)
+parser.add_argument("--seed", type=int, default=0)
+args = parser.parse_args()
+
+rng = random.Random(args.seed)
+task = sas.generate_initial_state(args.sas_file, compact=True)[KEY_IN_STATE]
+fields = [field for field in FIELDS if getattr(task, field)]
+
+
+def get_result(task, use_numpy):
+    try:
+        validate_compact_task(task, use_numpy=use_numpy)
+    except AssertionError as e:
+        return str(e)
+    return None
+
+
+num_invalid = 0
+for run in range(args.runs):
+    corrupted = copy.copy(task)
+    field = rng.choice(fields)
+    values = copy.copy(getattr(task, field))
+    index = rng.randrange(len(values))
+    # Values just outside the valid ranges are the most likely to slip
+    # through one of the implementations.
+    values[index] = rng.choice([-2, -1, 0, 1, task.num_variables,
+                                rng.randint(-2, max(values) + 2)])
+    setattr(corrupted, field, values)
+    python_result = get_result(corrupted, use_numpy=False)
+    numpy_result = get_result(corrupted, use_numpy=True)
+    if python_result != numpy_result:
+        sys.exit(f"Validations disagree after setting {field}[{index}] to "
+                 f"{values[index]}:\n"
+                 f"Python: {python_result}\n"
+                 f"NumPy:  {numpy_result}")
+    num_invalid += python_result is not None
+
+print(f"Both validations agree on {args.runs} corrupted tasks "
+      f"({num_invalid} of them invalid).")
@@ -19,7 +19,9 @@ from machetli import tools, templates
 from machetli.errors import SubmissionError, PollingError, \
     format_called_process_error
 from machetli.evaluator import EXIT_CODE_BEHAVIOR_PRESENT, \
-    EXIT_CODE_BEHAVIOR_NOT_PRESENT, EXIT_CODE_RESOURCE_LIMIT
+    EXIT_CODE_BEHAVIOR_NOT_PRESENT, EXIT_CODE_RESOURCE_LIMIT, RESULT_FILENAME, \
+    read_result
+from machetli.state_codecs import PickleCodec
 from machetli.successors import Successor
 from machetli.tools import write_state, run
 
@@ -66,6 +68,12 @@ class EvaluationTask():
         self.run_dir = run_dir
         self.status = self.PENDING
         self.error_msg = ""
+        self.result = {}
+        """
+        Additional information the evaluator reported about this evaluation
+        (see :meth:`machetli.evaluator.write_result`). This is empty until the
+        evaluation completed and if the evaluator did not report anything.
+        """
 
 
 class EvaluationJob():
@@ -84,6 +92,7 @@ class EvaluationJob():
 
 
 def _update_completed_task_status(task, exit_code):
+    task.result = read_result(task.run_dir)
     if exit_code == EXIT_CODE_BEHAVIOR_PRESENT:
         task.status = EvaluationTask.DONE_AND_BEHAVIOR_PRESENT
     elif exit_code == EXIT_CODE_BEHAVIOR_NOT_PRESENT:
@@ -127,6 +136,32 @@ class Environment:
           terminate
         * `CRITICAL`: silent unless the program crashes
 
+    :param speculative_batch_size:
+        Number of successors of an improving successor that are evaluated
+        speculatively before the search commits to it (default: 0, i.e., no
+        speculation). In non-deterministic mode, the search starts evaluating
+        the first successors of every successor found to be improving while
+        the rest of its batch is still being evaluated or canceled. The results
+        for the successor the search commits to are then available early in
+        the next iteration, while speculative evaluations for the other
+        successors are canceled. This is only useful in environments that
+        evaluate successors in parallel.
+
+    :param state_compression:
+        Compression format of the states written to the run directories (one
+        of the keys of :attr:`COMPRESSION_FORMATS
+        <machetli.tools.COMPRESSION_FORMATS>`, default: no compression). The
+        suffix of the format is appended to :attr:`STATE_FILENAME`.
+        Compressing states takes additional time but reduces the amount of
+        data written to the (shared) file system considerably.
+
+    :param state_codec:
+        :class:`StateCodec <machetli.state_codecs.StateCodec>` used to write
+        the states to the run directories (default:
+        :class:`PickleCodec <machetli.state_codecs.PickleCodec>`). Its suffix
+        replaces the suffix of :attr:`STATE_FILENAME`, so the evaluator reads
+        the state with the same codec.
+
     """
 
     STATE_FILENAME = "state.pickle"
@@ -136,7 +171,9 @@ class Environment:
     login and compute nodes.
     """
 
-    def __init__(self, batch_size=1, loglevel=logging.INFO):
+    def __init__(self, batch_size=1, loglevel=logging.INFO,
+                 speculative_batch_size=0, state_compression=None,
+                 state_codec=None):
         # TODO: this is accidentally doing what we want: in interactive python sessions
         # we don't have a script path and want to use the name of the current working directory
         # as the experiment name. This is what get_script_path returns, but this is coincidental.
@@ -148,8 +185,18 @@ class Environment:
 
         self.iteration_id = 0
         self.batch_id = 0
+        self.speculation_id = 0
         self.batch_size = batch_size
         self.loglevel = loglevel
+        self.speculative_batch_size = speculative_batch_size
+        self.state_codec = state_codec or PickleCodec()
+        self.state_filename = str(Path(self.STATE_FILENAME).with_suffix(
+            self.state_codec.suffix))
+        if state_compression is not None:
+            if state_compression not in tools.COMPRESSION_FORMATS:
+                logging.critical(
+                    f"Unknown compression format '{state_compression}'.")
+            self.state_filename += f".{state_compression}"
         self.initial_state = None
         self.initial_state_run_dir = None
 
@@ -160,6 +207,7 @@ class Environment:
         """
         self.iteration_id += 1
         self.batch_id = 0
+        self.speculation_id = 0
 
     def _start_new_batch(self) -> tuple[Path, str]:
         self.batch_id += 1
@@ -177,24 +225,48 @@ class Environment:
             raise SubmissionError(
                 f"Could not create run_dir at '{run_dir}'. Do you have old "
                 f"experiment data at '{self.eval_dir}'?")
-        write_state(state, run_dir/self.STATE_FILENAME)
+        write_state(state, run_dir/self.state_filename,
+                    codec=self.state_codec)
         return run_dir
 
 
-    def _prepare_job(self, evaluator_path, batch) -> EvaluationJob:
+    def _prepare_job(self, evaluator_path, batch, batch_dir=None,
+                     job_name=None) -> EvaluationJob:
         """
         Creates a run directory for each successor in *batch* and writes a
         pickled version of the state to disk. Returns an EvaluationJob that
         represents the current status of this batch's evaluation.
         """
-        batch_dir, job_name = self._start_new_batch()
+        if batch_dir is None:
+            batch_dir, job_name = self._start_new_batch()
         tasks = []
         for task_id, successor in enumerate(batch):
             run_dir = self._populate_run_dir(batch_dir, task_id, successor.state)
             tasks.append(EvaluationTask(successor, task_id, run_dir))
         return EvaluationJob(job_name, evaluator_path, batch_dir, tasks)
 
-    def _run_job(self, job, on_task_completed) -> list[EvaluationTask]:
+    def _run_job(self, job, on_task_completed):
+        self._start_job(job)
+        self._wait_for_job(job, on_task_completed)
+
+    def _start_job(self, job):
+        """
+        Start the evaluation of all tasks in *job* without waiting for
+        results.
+        """
+        raise NotImplementedError
+
+    def _wait_for_job(self, job, on_task_completed):
+        """
+        Wait until all tasks of a started *job* are no longer pending and call
+        *on_task_completed* for each task once it completes.
+        """
+        raise NotImplementedError
+
+    def _cancel(self, job, ids_to_cancel):
+        """
+        Cancel the evaluation of all pending tasks in *job* with the given IDs.
+        """
         raise NotImplementedError
 
     def remember_initial_state(self, initial_state):
@@ -248,6 +320,40 @@ class Environment:
         self._run_job(job, on_task_completed)
         return job.tasks
 
+    def speculate(self, evaluator_path, batch) -> EvaluationJob:
+        """
+        Start evaluating the successors in *batch* of an improving successor
+        before the search decided whether to commit to it.
+        The successors are stored with the batches of the next iteration.
+        Return an :class:`EvaluationJob` that can later be passed to
+        :meth:`resume` to collect the results, or to :meth:`cancel` if the
+        results are not needed.
+        """
+        self.speculation_id += 1
+        iteration_name = f"iteration_{self.iteration_id + 1:05}"
+        speculation_name = f"speculation_{self.speculation_id:05}"
+        job_name = f"{self.exp_name}-{iteration_name}-{speculation_name}"
+        batch_dir = self.eval_dir/iteration_name/speculation_name
+        job = self._prepare_job(evaluator_path, batch, batch_dir, job_name)
+        self._start_job(job)
+        return job
+
+    def resume(self, job, on_task_completed) -> list[EvaluationTask]:
+        """
+        Wait for the results of a *job* started with :meth:`speculate`. The
+        callback *on_task_completed* is used as in :meth:`run`, including for
+        tasks that completed before this method was called.
+        """
+        self._wait_for_job(job, on_task_completed)
+        return job.tasks
+
+    def cancel(self, job):
+        """
+        Cancel all pending evaluations of a *job* started with
+        :meth:`speculate`.
+        """
+        self._cancel(job, range(len(job.tasks)))
+
 
 class LocalEnvironment(Environment):
     """
@@ -255,20 +361,27 @@ class LocalEnvironment(Environment):
 
     See :class:`Environment` for inherited options.
     """
-    def _run_job(self, job, on_task_completed):
+    def _start_job(self, job):
+        # Tasks are evaluated sequentially while waiting for the job.
+        pass
+
+    def _wait_for_job(self, job, on_task_completed):
         for task in job.tasks:
-            if task.status == EvaluationTask.CANCELED:
+            if task.status != EvaluationTask.PENDING:
                 continue
             self._run_task(job.evaluator_path, task)
             ids_to_cancel = []
             if on_task_completed:
                 ids_to_cancel = on_task_completed(task) or []
-            for i in ids_to_cancel:
-                if job.tasks[i].status == EvaluationTask.PENDING:
-                    job.tasks[i].status = EvaluationTask.CANCELED
+            self._cancel(job, ids_to_cancel)
+
+    def _cancel(self, job, ids_to_cancel):
+        for i in ids_to_cancel:
+            if job.tasks[i].status == EvaluationTask.PENDING:
+                job.tasks[i].status = EvaluationTask.CANCELED
 
     def _run_task(self, evaluator_path: Path, task):
-        cmd = [str(evaluator_path.absolute()), self.STATE_FILENAME]
+        cmd = [str(evaluator_path.absolute()), self.state_filename]
         try:
             cwd = task.run_dir
             with (cwd/"run.log").open("w") as run_log, (cwd/"run.err").open("w") as run_err:
@@ -399,8 +512,9 @@ class SlurmEnvironment(Environment):
 
         self.sbatch_template = resources.read_text(templates, "slurm-array-job.template")
 
-    def _prepare_job(self, evaluator_path, batch):
-        job = super()._prepare_job(evaluator_path, batch)
+    def _prepare_job(self, evaluator_path, batch, batch_dir=None,
+                     job_name=None):
+        job = super()._prepare_job(evaluator_path, batch, batch_dir, job_name)
 
         run_dirs = [task.run_dir for task in job.tasks]
         # Give the NFS time to write the paths
@@ -413,9 +527,12 @@ class SlurmEnvironment(Environment):
         self._write_sbatch_file(job)
         return job
 
-    def _run_job(self, job, on_task_completed):
+    def _start_job(self, job):
         self._submit(job)
-        pending_task_ids = set(range(len(job.tasks)))
+
+    def _wait_for_job(self, job, on_task_completed):
+        pending_task_ids = {task.successor_id for task in job.tasks
+                            if task.status == EvaluationTask.PENDING}
         while pending_task_ids:
             time.sleep(self.POLLING_TIME_INTERVAL)
             self._update_status(job)
@@ -426,7 +543,9 @@ class SlurmEnvironment(Environment):
                     task = job.tasks[task_id]
                     if task.status != EvaluationTask.PENDING:
                         pending_task_ids.remove(task_id)
-                        ids_to_cancel = on_task_completed(task)
+                        ids_to_cancel = None
+                        if on_task_completed:
+                            ids_to_cancel = on_task_completed(task)
                         if ids_to_cancel:
                             self._cancel(job, ids_to_cancel)
                         pending_tasks_changed = True
@@ -468,7 +587,8 @@ class SlurmEnvironment(Environment):
             0.98 * self.cpus_per_task * self._get_memory_in_kb(
                 self.memory_per_cpu))
         job_params["python"] = tools.get_python_executable()
-        job_params["state_filename"] = self.STATE_FILENAME
+        job_params["state_filename"] = self.state_filename
+        job_params["result_filename"] = RESULT_FILENAME
         run_dirs = [str(task.run_dir) for task in job.tasks]
         job_params["run_dirs"] = " ".join(run_dirs)
         job_params["max_job_id"] = len(job.tasks) - 1
@@ -544,6 +664,9 @@ class SlurmEnvironment(Environment):
     def _update_status(self, job):
         status_by_task_id = self._get_slurm_status(job)
         for task in job.tasks:
+            if task.status != EvaluationTask.PENDING:
+                # Completed and canceled tasks keep their status.
+                continue
             try:
                 slurm_status = status_by_task_id[task.successor_id]
             except KeyError:
@@ -559,6 +682,11 @@ class SlurmEnvironment(Environment):
                     task.status = EvaluationTask.CRITICAL
                     task.error_msg = f"Missing exit code file '{str(result_file)}'"
                     continue
+                # The job script writes the result file before the exit code,
+                # but on the NFS it may become visible later.
+                if not self._wait_for_filesystem(task.run_dir/RESULT_FILENAME):
+                    logging.warning(
+                        f"Missing result file in '{task.run_dir}'.")
                 _update_completed_task_status(task, exit_code)
             elif slurm_status in self.BUSY_STATES:
                 task.status = EvaluationTask.PENDING
@@ -8,8 +8,12 @@ general convenience function for implementing evaluators. Additional convenience
 functions come with specific packages.
 """
 
+import json
 import logging
+import os
+from pathlib import Path
 import sys
+import tempfile
 
 from machetli.tools import read_state
 
@@ -37,6 +41,62 @@ as an error, because it means that the evaluator completed without communicating
 a result.
 """
 
+RESULT_FILENAME = "result.json"
+"""
+Name of the file in which evaluators store additional information about an
+evaluation, such as runtimes or parsed values. The file is written in JSON
+format to the run directory of the evaluated state and is loaded by the
+environment into :attr:`EvaluationTask.result
+<machetli.environments.EvaluationTask.result>` once the evaluation completes.
+"""
+
+
+def write_result(result: dict, directory="."):
+    """
+    Write the dictionary *result* as :attr:`RESULT_FILENAME` to *directory*.
+    All keys and values must be serializable as JSON. The file is replaced
+    atomically, so readers never see a partially written result.
+    """
+    path = Path(directory, RESULT_FILENAME)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=RESULT_FILENAME)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(result, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def read_result(directory) -> dict:
+    """
+    Read the dictionary written by :meth:`write_result` from *directory*.
+    Return an empty dictionary if the evaluator did not write a result.
+    """
+    path = Path(directory, RESULT_FILENAME)
+    try:
+        return json.loads(path.read_text())
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logging.warning(f"Could not read evaluation result '{path}': {e}")
+        return {}
+
+
+def _exit_with_result(result):
+    # Evaluation functions either return a truth value or a pair of a truth
+    # value and a dictionary with additional information.
+    if isinstance(result, tuple):
+        behavior_present, info = result
+        write_result(info)
+    else:
+        behavior_present = result
+
+    if behavior_present:
+        sys.exit(EXIT_CODE_BEHAVIOR_PRESENT)
+    else:
+        sys.exit(EXIT_CODE_BEHAVIOR_NOT_PRESENT)
+
 
 def run_evaluator(evaluate):
     """
@@ -53,8 +113,11 @@ def run_evaluator(evaluate):
 
     :param evaluate: is a function taking the filename of a state as
         input and returning ``True`` if the specified behavior occurs for the
-        given instance, and ``False`` if it doesn't. Other ways of exiting the
-        function (exceptions, ``sys.exit`` with exit codes other than
+        given instance, and ``False`` if it doesn't. Alternatively, the
+        function can return a pair of such a truth value and a dictionary of
+        additional information (e.g., runtimes or parsed values) that is
+        written to :attr:`RESULT_FILENAME` with :meth:`write_result` and made
+        available to the search. Other ways of exiting the function (exceptions, ``sys.exit`` with exit codes other than
         :attr:`EXIT_CODE_BEHAVIOR_PRESENT<machetli.evaluator.EXIT_CODE_BEHAVIOR_PRESENT>` or
         :attr:`EXIT_CODE_BEHAVIOR_NOT_PRESENT<machetli.evaluator.EXIT_CODE_BEHAVIOR_NOT_PRESENT>`)
         are treated as failed evaluations by the search.
@@ -65,8 +128,4 @@ def run_evaluator(evaluate):
                          "command line parameter.")
         sys.exit(EXIT_CODE_CRITICAL)
     state = read_state(sys.argv[1])
-
-    if evaluate(state):
-        sys.exit(EXIT_CODE_BEHAVIOR_PRESENT)
-    else:
-        sys.exit(EXIT_CODE_BEHAVIOR_NOT_PRESENT)
+    _exit_with_result(evaluate(state))
@@ -1,3 +1,6 @@
+import gc
+import re
+
 __all__ = ["ParseError", "parse_nested_list"]
 
 class ParseError(Exception):
@@ -6,39 +9,103 @@ class ParseError(Exception):
     def __str__(self):
         return self.value
 
+# Comments run from ";" to the end of the line.
+COMMENT_REGEX = re.compile(r";[^\n]*")
+
+MISSING_PARENTHESIS_ERROR = "Missing ')'"
+END_OF_FILE_ERROR = "Expected '(', got end of file."
+
 # Basic functions for parsing PDDL (Lisp) files.
 def parse_nested_list(input_file):
-    tokens = tokenize(input_file)
-    next_token = next(tokens)
-    if next_token != "(":
-        raise ParseError("Expected '(', got %s." % next_token)
-    result = list(parse_list_aux(tokens))
-    for tok in tokens:  # Check that generator is exhausted.
-        raise ParseError("Unexpected token: %s." % tok)
-    return result
+    text = _read_text(input_file)
+    code = COMMENT_REGEX.sub("", text)
+    if code.isascii():
+        return _build_nested_list(_split_tokens(code))
+    valid_prefix, non_ascii_error = _find_non_ascii_line(text)
+    # Fast Downward's parser reads the input lazily, so it reports errors
+    # that can be detected before the first non-ASCII line first.
+    try:
+        _build_nested_list(tokenize(valid_prefix))
+    except ParseError as error:
+        if error.value not in [MISSING_PARENTHESIS_ERROR, END_OF_FILE_ERROR]:
+            raise
+    raise non_ascii_error
 
 def tokenize(input):
-    for line in input:
-        line = line.split(";", 1)[0]  # Strip comments.
-        try:
-            line.encode("ascii")
-        except UnicodeEncodeError:
-            raise ParseError("Non-ASCII character outside comment: %s" %
-                             line[0:-1])
-        line = line.replace("(", " ( ").replace(")", " ) ").replace("?", " ?")
-        for token in line.split():
-            yield token.lower()
-
-def parse_list_aux(tokenstream):
-    # Leading "(" has already been swallowed.
-    while True:
-        try:
-            token = next(tokenstream)
-        except StopIteration:
-            raise ParseError("Missing ')'")
-        if token == ")":
-            return
-        elif token == "(":
-            yield list(parse_list_aux(tokenstream))
+    """Return the list of lowercased tokens in *input*, which can be a file,
+    an iterable of lines, or a string. The whole input is processed at once
+    instead of line by line."""
+    text = _read_text(input)
+    code = COMMENT_REGEX.sub("", text)
+    if not code.isascii():
+        raise _find_non_ascii_line(text)[1]
+    return _split_tokens(code)
+
+def _read_text(input):
+    if isinstance(input, str):
+        return input
+    if hasattr(input, "read"):
+        return input.read()
+    return "".join(input)
+
+def _split_tokens(code):
+    # Parentheses are tokens of their own and "?" starts a new token. This
+    # is much faster than matching tokens with a regular expression.
+    code = code.lower().replace("(", " ( ").replace(")", " ) ")
+    return code.replace("?", " ?").split()
+
+def _find_non_ascii_line(text):
+    # Return the text before the first line with a non-ASCII character
+    # outside of a comment, and the error for this line in the format of
+    # Fast Downward's line-by-line tokenizer.
+    lines = text.split("\n")
+    num_checked_chars = 0
+    for index, line in enumerate(lines):
+        if index < len(lines) - 1:
+            line += "\n"
+        code = line.split(";", 1)[0]
+        if not code.isascii():
+            return text[:num_checked_chars], ParseError(
+                "Non-ASCII character outside comment: %s" % code[0:-1])
+        num_checked_chars += len(line)
+    raise ValueError("Text contains no non-ASCII code.")
+
+def _build_nested_list(tokens):
+    # Creating many small lists triggers the cyclic garbage collector over
+    # and over again although none of them can be garbage, so we disable it
+    # while building the lists.
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _build_nested_list_without_gc(tokens)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+def _build_nested_list_without_gc(tokens):
+    if not tokens:
+        raise ParseError(END_OF_FILE_ERROR)
+    if tokens[0] != "(":
+        raise ParseError("Expected '(', got %s." % tokens[0])
+    # Build the nested lists with an explicit stack of the enclosing lists
+    # instead of recursive generators, so deeply nested input cannot exceed
+    # the recursion limit.
+    enclosing_lists = []
+    current_list = []
+    for index in range(1, len(tokens)):
+        token = tokens[index]
+        if token == "(":
+            nested_list = []
+            current_list.append(nested_list)
+            enclosing_lists.append(current_list)
+            current_list = nested_list
+        elif token == ")":
+            if not enclosing_lists:
+                if index + 1 < len(tokens):
+                    raise ParseError("Unexpected token: %s." %
+                                     tokens[index + 1])
+                return current_list
+            current_list = enclosing_lists.pop()
         else:
-            yield token
+            current_list.append(token)
+    raise ParseError(MISSING_PARENTHESIS_ERROR)
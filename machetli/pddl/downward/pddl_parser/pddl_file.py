@@ -1,21 +1,22 @@
 # import options
 
+from machetli.tools import open_file
+
 from . import lisp_parser
 from . import parsing_functions
 # from .. import options
 
-file_open = open
-
 
 def parse_pddl_file(type, filename):
     try:
         # The builtin open function is shadowed by this module's open function.
+        # open_file also decompresses files with a compression suffix.
         # We use the Latin-1 encoding (which allows a superset of ASCII, of the
         # Latin-* encodings and of UTF-8) to allow special characters in
         # comments. In all other parts, we later validate that only ASCII is
         # used.
-        return lisp_parser.parse_nested_list(file_open(filename,
-                                                       encoding='ISO-8859-1'))
+        with open_file(filename, encoding='ISO-8859-1') as file:
+            return lisp_parser.parse_nested_list(file)
     except OSError as e:
         raise SystemExit("Error: Could not read file: %s\nReason: %s." %
                          (e.filename, e))
@@ -1,17 +1,19 @@
+import hashlib
 import logging
+import os
 from pathlib import Path
 from pickle import PickleError
 import sys
+import tempfile
 from typing import Union
 
 from machetli.pddl.constants import KEY_IN_STATE
 from machetli.pddl.downward import pddl_parser
-from machetli.pddl.downward.pddl import Truth
-from machetli.pddl.downward.pddl.conditions import ConstantCondition, Atom
+from machetli.pddl.downward.pddl import Falsity, Truth
+from machetli.pddl.downward.pddl.conditions import Atom
 
 from machetli import tools
-from machetli.evaluator import EXIT_CODE_CRITICAL, EXIT_CODE_BEHAVIOR_PRESENT, \
-    EXIT_CODE_BEHAVIOR_NOT_PRESENT
+from machetli.evaluator import EXIT_CODE_CRITICAL, _exit_with_result
 
 SIN = " "  # single indentation
 DIN = "  "  # double indentation
@@ -36,18 +38,82 @@ def find_domain_path(task_path: Path):
 
 
 def generate_initial_state(domain_path: Union[Path, str],
-                           task_path: Union[Path, str]) -> dict:
+                           task_path: Union[Path, str],
+                           cache_dir: Union[Path, str] = None) -> dict:
     """
-    Parse the PDDL task defined in the given PDDL files. 
+    Parse the PDDL task defined in the given PDDL files. Files with the suffix
+    of a compression format (e.g., ``problem.pddl.gz``, see
+    :attr:`COMPRESSION_FORMATS <machetli.tools.COMPRESSION_FORMATS>`) are
+    decompressed while reading them.
+
+    :param cache_dir: if given, the parsed task is stored in this directory
+        and loaded from there instead of parsing the files again the next
+        time the same files are used. Cache entries are identified by the
+        content of both files and the version of Machetli, so changed files
+        are parsed again.
 
     :return: a dictionary pointing to the task specified in the files.
     """
+    if cache_dir is None:
+        task = pddl_parser.open(domain_filename=domain_path,
+                                task_filename=task_path)
+    else:
+        task = _get_cached_task(domain_path, task_path, Path(cache_dir))
     return {
-        KEY_IN_STATE: pddl_parser.open(domain_filename=domain_path,
-                                       task_filename=task_path)
+        KEY_IN_STATE: task
     }
 
 
+def _get_machetli_version():
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:
+        # importlib.metadata is only available from Python 3.8 on.
+        return "unknown"
+    try:
+        return version("machetli")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def _get_cache_key(domain_path, task_path):
+    cache_hash = hashlib.sha256(_get_machetli_version().encode())
+    for path in [domain_path, task_path]:
+        file_hash = hashlib.sha256()
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(2**20), b""):
+                file_hash.update(block)
+        cache_hash.update(file_hash.digest())
+    return cache_hash.hexdigest()
+
+
+def _get_cached_task(domain_path, task_path, cache_dir: Path):
+    cache_path = cache_dir / f"{_get_cache_key(domain_path, task_path)}.pickle"
+    if cache_path.exists():
+        try:
+            task = tools.read_state(cache_path)[KEY_IN_STATE]
+            logging.info(f"Loaded parsed PDDL task from cache '{cache_path}'.")
+            return task
+        except (PickleError, EOFError, AttributeError, ImportError,
+                KeyError) as error:
+            logging.warning(f"Ignoring invalid cache entry '{cache_path}': "
+                            f"{error}")
+    task = pddl_parser.open(domain_filename=domain_path,
+                            task_filename=task_path)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    # Write to a temporary file first, so concurrent searches never read a
+    # partially written cache entry.
+    handle, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".pickle")
+    os.close(handle)
+    try:
+        tools.write_state({KEY_IN_STATE: task}, tmp_path)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return task
+
+
 def _run_evaluator_on_pddl_files(evaluate, domain_filename, task_filename):
     """
     Run the given function *evaluate* and exit with the appropriate exit code.
@@ -58,7 +124,10 @@ def _run_evaluator_on_pddl_files(evaluate, domain_filename, task_filename):
 
     :param evaluate: is a function taking filenames of a PDDL domain and problem
         file as input and returning ``True`` if the specified behavior occurs
-        for the given instance, and ``False`` if it doesn't. Other ways of
+        for the given instance, and ``False`` if it doesn't. The function can
+        also return a pair of such a truth value and a dictionary of additional
+        information as described in
+        :meth:`machetli.evaluator.run_evaluator`. Other ways of
         exiting the function (exceptions, ``sys.exit`` with exit codes other than
         :attr:`EXIT_CODE_BEHAVIOR_PRESENT<machetli.evaluator.EXIT_CODE_BEHAVIOR_PRESENT>` or
         :attr:`EXIT_CODE_BEHAVIOR_NOT_PRESENT<machetli.evaluator.EXIT_CODE_BEHAVIOR_NOT_PRESENT>`)
@@ -66,10 +135,7 @@ def _run_evaluator_on_pddl_files(evaluate, domain_filename, task_filename):
     :param domain_filename: is the filename of a PDDL domain file.
     :param task_filename: is the filename of a PDDL problem file.
     """
-    if evaluate(domain_filename, task_filename):
-        sys.exit(EXIT_CODE_BEHAVIOR_PRESENT)
-    else:
-        sys.exit(EXIT_CODE_BEHAVIOR_NOT_PRESENT)
+    _exit_with_result(evaluate(domain_filename, task_filename))
 
 
 def run_evaluator(evaluate):
@@ -92,7 +158,10 @@ def run_evaluator(evaluate):
 
     :param evaluate: is a function taking filenames of a PDDL domain and problem
         file as input and returning ``True`` if the specified behavior occurs
-        for the given instance, and ``False`` if it doesn't. Other ways of
+        for the given instance, and ``False`` if it doesn't. The function can
+        also return a pair of such a truth value and a dictionary of additional
+        information as described in
+        :meth:`machetli.evaluator.run_evaluator`. Other ways of
         exiting the function (exceptions, ``sys.exit`` with exit codes other than
         :attr:`EXIT_CODE_BEHAVIOR_PRESENT<machetli.evaluator.EXIT_CODE_BEHAVIOR_PRESENT>` or
         :attr:`EXIT_CODE_BEHAVIOR_NOT_PRESENT<machetli.evaluator.EXIT_CODE_BEHAVIOR_NOT_PRESENT>`)
@@ -209,7 +278,9 @@ def _write_domain_actions(task, file):
         file.write(")\n")
 
         file.write(SIN + SIN + ":precondition\n")
-        if not isinstance(action.precondition, Truth):
+        if isinstance(action.precondition, Truth):
+            file.write(DIN + "(and)\n")
+        else:
             action.precondition.dump_pddl(file, DIN)
         file.write(DIN + ":effect\n")
         file.write(DIN + "(and\n")
@@ -233,7 +304,7 @@ def _write_domain_axioms(task, file):
 
 
 def _write_domain(task, path: Path):
-    with path.open("w") as file:
+    with tools.open_file(path, "w") as file:
         file.write("\n(")
         _write_domain_header(task, file)
         _write_domain_requirements(task, file)
@@ -266,7 +337,13 @@ def _write_problem_init(task, file):
 
 def _write_problem_goal(task, file):
     file.write(SIN + "(:goal\n")
-    if not isinstance(task.goal, ConstantCondition):
+    # The goal cannot be empty, so we write constant goals as an empty
+    # conjunction or disjunction.
+    if isinstance(task.goal, Truth):
+        file.write(SIN + DIN + "(and)\n")
+    elif isinstance(task.goal, Falsity):
+        file.write(SIN + DIN + "(or)\n")
+    else:
         task.goal.dump_pddl(file, SIN + DIN)
     file.write("%s)\n" % SIN)
 
@@ -277,7 +354,7 @@ def _write_problem_metric(task, file):
 
 
 def _write_problem(task, path: Path):
-    with path.open("w") as file:
+    with tools.open_file(path, "w") as file:
         file.write("\n(")
         _write_problem_header(task, file)
         _write_problem_domain(task, file)
@@ -290,7 +367,8 @@ def _write_problem(task, path: Path):
 def write_files(state: dict, domain_path: Union[Path, str],
                 problem_path: Union[Path, str]):
     """
-    Write the domain and problem files represented in `state` to disk.
+    Write the domain and problem files represented in `state` to disk. Files
+    with the suffix of a compression format are compressed.
     """
     _write_domain(state[KEY_IN_STATE], Path(domain_path))
     _write_problem(state[KEY_IN_STATE], Path(problem_path))
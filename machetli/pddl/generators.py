@@ -1,31 +1,53 @@
+from collections import defaultdict
 import copy
 import logging
 
 from machetli.pddl import visitors
 from machetli.pddl.constants import KEY_IN_STATE
-from machetli.successors import Successor, SuccessorGenerator, RNG
+from machetli.pddl.downward.pddl import Atom, Conjunction, Task
+from machetli.pddl.occurrences import TaskOccurrences, iter_literals, \
+    iter_action_literals
+from machetli.successors import Successor, SuccessorGenerator, RNG, \
+    get_run_dir_path, get_bisection_chunks, check_order, order_candidates, \
+    ORDER_RANDOM
+from machetli.tools import read_plan
+
+
+def _make_successor(state, child_task, msg):
+    # Copy everything except the task, which successor generators create
+    # without modifying the task of the parent state.
+    child_state = {key: copy.deepcopy(value) for key, value in state.items()
+                   if key != KEY_IN_STATE}
+    child_state[KEY_IN_STATE] = child_task
+    return Successor(child_state, msg)
 
 
 class RemoveActions(SuccessorGenerator):
     """
     For each action schema in the PDDL domain, generate a successor
     where this action schema is removed. The order of the successors is
-    randomized.
+    randomized. With *order* set to :attr:`ORDER_LARGEST_FIRST
+    <machetli.successors.ORDER_LARGEST_FIRST>`, action schemas with the most
+    literals in their preconditions and effects are tried first.
     """
+    def __init__(self, order=ORDER_RANDOM):
+        check_order(order)
+        self.order = order
+
     def get_description(self):
         return "Tries to remove individual action schemas."
 
     def get_successors(self, state):
         task = state[KEY_IN_STATE]
         action_names = [action.name for action in task.actions]
-        RNG.shuffle(action_names)
+        action_sizes = {action.name: sum(1 for _ in iter_action_literals(action))
+                        for action in task.actions}
+        order_candidates(action_names, self.order, action_sizes.get)
         for name in action_names:
-            child_state = copy.deepcopy(state)
-            pre_child_task = child_state[KEY_IN_STATE]
-            child_state[KEY_IN_STATE] = pre_child_task.accept(
-                visitors.TaskElementEraseActionVisitor(name))
-            yield Successor(child_state,
-                            f"Removed action '{name}'. Remaining actions: {len(task.actions) - 1}")
+            child_task = task.accept(visitors.TaskElementEraseActionVisitor(name))
+            yield _make_successor(
+                state, child_task,
+                f"Removed action '{name}'. Remaining actions: {len(task.actions) - 1}")
 
 
 class RemovePredicates(SuccessorGenerator):
@@ -40,7 +62,9 @@ class RemovePredicates(SuccessorGenerator):
     * ``"dynamic"`` (default) replaces an atom of the removed predicate with
       true if it occurs positively and with false otherwise.
 
-    The order of the successors is randomized.
+    The order of the successors is randomized. With *order* set to
+    :attr:`ORDER_LARGEST_FIRST <machetli.successors.ORDER_LARGEST_FIRST>`,
+    predicates that occur most often in the task are tried first.
     """
     def get_description(self):
         if self.replace_with == "dynamic":
@@ -48,8 +72,10 @@ class RemovePredicates(SuccessorGenerator):
         else:
             return f"Tries to remove individual predicates, replacing them with {self.replace_with}."
 
-    def __init__(self, replace_with="dynamic"):
+    def __init__(self, replace_with="dynamic", order=ORDER_RANDOM):
         self.replace_with = replace_with
+        check_order(order)
+        self.order = order
         if replace_with == "dynamic":
             self.visitor = visitors.TaskElementErasePredicateTrueLiteralVisitor
         elif replace_with == "true":
@@ -63,14 +89,14 @@ class RemovePredicates(SuccessorGenerator):
     def get_successors(self, state):
         task = state[KEY_IN_STATE]
         predicate_names = [predicate.name for predicate in task.predicates if
-                           not (predicate.name == "dummy_axiom_trigger" or predicate.name == "=")]
-        RNG.shuffle(predicate_names)
+                           not (predicate.name == visitors.DUMMY_AXIOM_TRIGGER or predicate.name == "=")]
+        occurrences = TaskOccurrences(task)
+        order_candidates(predicate_names, self.order,
+                         occurrences.predicates.get_num_occurrences)
         for name in predicate_names:
-            child_state = copy.deepcopy(state)
-            pre_child_task = child_state[KEY_IN_STATE]
-            child_state[KEY_IN_STATE] = pre_child_task.accept(self.visitor(name))
-            yield Successor(
-                child_state,
+            child_task = task.accept(self.visitor(name, occurrences))
+            yield _make_successor(
+                state, child_task,
                 f"Removed predicate '{name}'. Remaining predicates: {len(task.predicates) - 1}")
 
 
@@ -78,19 +104,379 @@ class RemoveObjects(SuccessorGenerator):
     """
     For each object in the PDDL problem, generate a successor that
     removes this object from the PDDL task. The order of the successors
-    is randomized.
+    is randomized. With *order* set to :attr:`ORDER_LARGEST_FIRST
+    <machetli.successors.ORDER_LARGEST_FIRST>`, objects that occur most
+    often in the task are tried first.
     """
+    def __init__(self, order=ORDER_RANDOM):
+        check_order(order)
+        self.order = order
+
     def get_description(self):
         return "Tries to remove individual objects."
 
     def get_successors(self, state):
         task = state[KEY_IN_STATE]
         object_names = [obj.name for obj in task.objects]
-        RNG.shuffle(object_names)
+        occurrences = TaskOccurrences(task)
+        order_candidates(object_names, self.order,
+                         occurrences.objects.get_num_occurrences)
         for name in object_names:
-            child_state = copy.deepcopy(state)
-            pre_child_task = child_state[KEY_IN_STATE]
-            child_state[KEY_IN_STATE] = pre_child_task.accept(
-                visitors.TaskElementEraseObjectVisitor(name))
-            yield Successor(child_state,
-                            f"Removed object '{name}'. Remaining objects: {len(task.objects) - 1}")
+            child_task = task.accept(
+                visitors.TaskElementEraseObjectVisitor(name, occurrences))
+            yield _make_successor(
+                state, child_task,
+                f"Removed object '{name}'. Remaining objects: {len(task.objects) - 1}")
+
+
+class RemoveObjectsByType(SuccessorGenerator):
+    """
+    Group the objects of the PDDL problem by their type and generate
+    successors where a group of objects is removed at once. The group of a
+    type contains all objects of this type and of its subtypes. Types with
+    the same objects as a type tried before are skipped, as are chunks
+    with the same objects as a chunk tried before.
+
+    First, each group is removed as a whole. Afterwards, each group falls
+    back to smaller chunks: halves, quarters, and so on down to individual
+    objects (see :func:`get_bisection_chunks
+    <machetli.successors.get_bisection_chunks>`). The order of the types is
+    randomized. With *order* set to :attr:`ORDER_LARGEST_FIRST
+    <machetli.successors.ORDER_LARGEST_FIRST>`, types whose objects occur
+    most often in the task are tried first.
+    """
+    def __init__(self, order=ORDER_RANDOM):
+        check_order(order)
+        self.order = order
+
+    def get_description(self):
+        return "Tries to remove all objects of a type, then parts of them."
+
+    def _get_groups(self, task):
+        # The parser stores the transitive supertypes of each type in
+        # supertype_names.
+        supertypes = {tp.name: getattr(tp, "supertype_names", [])
+                      for tp in task.types}
+        groups = defaultdict(list)
+        for obj in task.objects:
+            groups[obj.type_name].append(obj.name)
+            for type_name in supertypes.get(obj.type_name, []):
+                groups[type_name].append(obj.name)
+        unique_groups = {}
+        seen = set()
+        for type_name, names in groups.items():
+            key = frozenset(names)
+            if key not in seen:
+                seen.add(key)
+                unique_groups[type_name] = names
+        return unique_groups
+
+    def get_successors(self, state):
+        task = state[KEY_IN_STATE]
+        occurrences = TaskOccurrences(task)
+        groups = self._get_groups(task)
+        group_sizes = {
+            type_name: sum(occurrences.objects.get_num_occurrences(name)
+                           for name in names)
+            for type_name, names in groups.items()}
+        type_names = list(groups)
+        order_candidates(type_names, self.order, group_sizes.get)
+        for type_name in type_names:
+            yield self._make_successor(
+                state, occurrences, type_name, groups[type_name])
+        # Groups are distinct, but the chunks of overlapping groups can
+        # contain the same objects, e.g., individual objects.
+        seen = {frozenset(names) for names in groups.values()}
+        for type_name in type_names:
+            names = RNG.sample(groups[type_name], len(groups[type_name]))
+            for chunk in get_bisection_chunks(names):
+                key = frozenset(chunk)
+                if key not in seen:
+                    seen.add(key)
+                    yield self._make_successor(
+                        state, occurrences, type_name, chunk)
+
+    def _make_successor(self, state, occurrences, type_name, names):
+        task = state[KEY_IN_STATE]
+        child_task = task.accept(
+            visitors.TaskElementEraseObjectsVisitor(names, occurrences))
+        return _make_successor(
+            state, child_task,
+            f"Removed {len(names)} objects of type '{type_name}'. "
+            f"Remaining objects: {len(child_task.objects)}")
+
+
+class RemoveInitFacts(SuccessorGenerator):
+    """
+    Generate successors where atoms of the initial state are removed. The
+    first successor removes all atoms at once, the following ones remove
+    halves of them, then quarters, and so on until individual atoms are
+    removed. The order of the atoms is randomized. Function assignments and
+    the atoms for equality and the dummy axiom trigger that the task
+    contains implicitly are never removed.
+    """
+    def get_description(self):
+        return "Tries to remove atoms of the initial state, starting with all of them."
+
+    def get_successors(self, state):
+        task = state[KEY_IN_STATE]
+        fact_ids = [fact_id for fact_id, fact in enumerate(task.init)
+                    if isinstance(fact, Atom) and fact.predicate not in
+                    ("=", visitors.DUMMY_AXIOM_TRIGGER)]
+        RNG.shuffle(fact_ids)
+        for chunk in get_bisection_chunks(fact_ids):
+            yield _make_successor(
+                state, self.transform(task, chunk),
+                f"Removed {len(chunk)} atoms of the initial state. Remaining "
+                f"atoms: {len(fact_ids) - len(chunk)}")
+
+    def transform(self, task, fact_ids):
+        removed = set(fact_ids)
+        new_init = [fact for fact_id, fact in enumerate(task.init)
+                    if fact_id not in removed]
+        return Task(task.domain_name, task.task_name, task.requirements,
+                    task.types, task.objects, task.predicates, task.functions,
+                    new_init, task.goal, task.actions, task.axioms,
+                    task.use_min_cost_metric)
+
+
+def _get_conjunct_paths(condition, prefix=()):
+    # Return the paths to all parts of conjunctions in condition. A path is
+    # a tuple of indices: the first one selects a part of condition, the
+    # second one a part of this part, and so on. Paths only depend on the
+    # structure of condition, so they stay valid as long as it is not
+    # changed. Removing a part of a conjunction only weakens the condition
+    # because negation only occurs in front of atoms.
+    paths = []
+    for index, part in enumerate(condition.parts):
+        path = prefix + (index,)
+        if isinstance(condition, Conjunction):
+            paths.append(path)
+        paths.extend(_get_conjunct_paths(part, path))
+    return paths
+
+
+def _remove_nested_paths(paths):
+    # Remove all paths that lead into a part that another path removes.
+    path_set = set(paths)
+    return [path for path in paths
+            if not any(path[:length] in path_set
+                       for length in range(1, len(path)))]
+
+
+def _get_conjunct_chunks(paths):
+    # Yield the bisection chunks of paths without nested paths. A chunk
+    # containing a path and paths nested in it removes the same parts as a
+    # chunk containing only this path, so such repeated chunks are skipped.
+    seen = set()
+    for chunk in get_bisection_chunks(paths):
+        chunk = _remove_nested_paths(chunk)
+        key = frozenset(chunk)
+        if key not in seen:
+            seen.add(key)
+            yield chunk
+
+
+def _remove_conjuncts(condition, paths):
+    # Return condition without the parts at the given paths relative to
+    # condition. Only the conditions on the paths are rebuilt, all other
+    # parts are shared with condition.
+    paths_by_part = defaultdict(list)
+    for index, *rest in paths:
+        paths_by_part[index].append(tuple(rest))
+    new_parts = []
+    for index, part in enumerate(condition.parts):
+        part_paths = paths_by_part.get(index)
+        if part_paths is None:
+            new_parts.append(part)
+        elif () not in part_paths:
+            new_parts.append(_remove_conjuncts(part, part_paths))
+    return condition._simplified(new_parts)
+
+
+def _replace_action(task, action_id, new_action):
+    new_actions = list(task.actions)
+    new_actions[action_id] = new_action
+    return Task(task.domain_name, task.task_name, task.requirements,
+                task.types, task.objects, task.predicates, task.functions,
+                task.init, task.goal, new_actions, task.axioms,
+                task.use_min_cost_metric)
+
+
+class RemoveGoals(SuccessorGenerator):
+    """
+    Generate successors where parts of conjunctions in the goal are removed.
+    The first successor removes all of them, the following ones remove
+    halves of them, then quarters, and so on until individual parts are
+    removed. Besides the conjuncts of the goal itself, this includes
+    conjuncts nested in other conditions of the goal, e.g., in the body of
+    a quantifier. Chunks that remove the same parts as an earlier chunk
+    are skipped. The order of the parts is randomized.
+    """
+    def get_description(self):
+        return "Tries to remove parts of the goal, starting with all of them."
+
+    def get_successors(self, state):
+        task = state[KEY_IN_STATE]
+        paths = _get_conjunct_paths(task.goal)
+        RNG.shuffle(paths)
+        for chunk in _get_conjunct_chunks(paths):
+            yield _make_successor(
+                state, self.transform(task, chunk),
+                f"Removed {len(chunk)} parts of the goal.")
+
+    def transform(self, task, paths):
+        new_goal = _remove_conjuncts(task.goal, paths)
+        return Task(task.domain_name, task.task_name, task.requirements,
+                    task.types, task.objects, task.predicates, task.functions,
+                    task.init, new_goal, task.actions, task.axioms,
+                    task.use_min_cost_metric)
+
+
+class RemovePreconditionParts(SuccessorGenerator):
+    """
+    For each action schema, generate successors where parts of conjunctions
+    in its precondition are removed. Like for :class:`RemoveGoals`, all
+    parts are removed first, then halves of them, and so on until
+    individual parts are removed. The order of the action schemas and of
+    the parts is randomized.
+    """
+    def get_description(self):
+        return "Tries to remove parts of the preconditions of action schemas."
+
+    def get_successors(self, state):
+        task = state[KEY_IN_STATE]
+        action_ids = list(range(len(task.actions)))
+        RNG.shuffle(action_ids)
+        for action_id in action_ids:
+            action = task.actions[action_id]
+            paths = _get_conjunct_paths(action.precondition)
+            RNG.shuffle(paths)
+            for chunk in _get_conjunct_chunks(paths):
+                yield _make_successor(
+                    state, self.transform(task, action_id, chunk),
+                    f"Removed {len(chunk)} parts of the precondition of "
+                    f"action '{action.name}'.")
+
+    def transform(self, task, action_id, paths):
+        new_action = copy.copy(task.actions[action_id])
+        new_action.precondition = _remove_conjuncts(
+            new_action.precondition, paths)
+        return _replace_action(task, action_id, new_action)
+
+
+class RemoveEffects(SuccessorGenerator):
+    """
+    For each action schema, generate successors where some of its effects
+    are removed. All effects are removed first, then halves of them, and so
+    on until individual effects are removed. The order of the action
+    schemas and of the effects is randomized.
+    """
+    def get_description(self):
+        return "Tries to remove effects of action schemas."
+
+    def get_successors(self, state):
+        task = state[KEY_IN_STATE]
+        action_ids = list(range(len(task.actions)))
+        RNG.shuffle(action_ids)
+        for action_id in action_ids:
+            action = task.actions[action_id]
+            effect_ids = list(range(len(action.effects)))
+            RNG.shuffle(effect_ids)
+            for chunk in get_bisection_chunks(effect_ids):
+                yield _make_successor(
+                    state, self.transform(task, action_id, chunk),
+                    f"Removed {len(chunk)} effects of action "
+                    f"'{action.name}'. Remaining effects: "
+                    f"{len(action.effects) - len(chunk)}")
+
+    def transform(self, task, action_id, effect_ids):
+        removed = set(effect_ids)
+        new_action = copy.copy(task.actions[action_id])
+        new_action.effects = [
+            effect for effect_id, effect in enumerate(new_action.effects)
+            if effect_id not in removed]
+        return _replace_action(task, action_id, new_action)
+
+
+def _collect_constants(condition, result):
+    # Add all objects (i.e., arguments that are not variables) mentioned in the
+    # given condition to the set result.
+    for literal in iter_literals(condition):
+        result.update(arg for arg in literal.args if not arg.startswith("?"))
+
+
+class RestrictToPlan(SuccessorGenerator):
+    """
+    Generate successors that only keep the action schemas and objects that
+    occur in the plan the evaluator found for the current state. The evaluator
+    has to write this plan to the file *plan_filename* in its working directory
+    (Fast Downward does this by default). Objects mentioned in the goal or in the
+    remaining actions and axioms are kept as well. The first successor removes
+    both unused actions and unused objects; if this is not successful, the
+    following successors remove only the actions or only the objects. If the
+    file does not exist, e.g., for the initial state, no successors are
+    generated.
+    """
+    def __init__(self, plan_filename="sas_plan"):
+        self.plan_filename = plan_filename
+
+    def get_description(self):
+        return ("Tries to remove all action schemas and objects that are not "
+                "used in the plan found by the evaluator.")
+
+    def get_successors(self, state):
+        plan_path = get_run_dir_path(state, self.plan_filename)
+        if plan_path is None:
+            return
+        task = state[KEY_IN_STATE]
+        used_actions = set()
+        used_objects = set()
+        for step in read_plan(plan_path):
+            action_name, *args = step.split()
+            used_actions.add(action_name)
+            used_objects.update(args)
+
+        _collect_constants(task.goal, used_objects)
+        for axiom in task.axioms:
+            _collect_constants(axiom.condition, used_objects)
+        # Objects mentioned in actions are only kept if the action is kept.
+        objects_of_used_actions = set(used_objects)
+        objects_of_all_actions = set(used_objects)
+        for action in task.actions:
+            objects = set()
+            _collect_constants(action.precondition, objects)
+            for effect in action.effects:
+                _collect_constants(effect.condition, objects)
+                _collect_constants(effect.literal, objects)
+            objects_of_all_actions |= objects
+            if action.name in used_actions:
+                objects_of_used_actions |= objects
+
+        unused_actions = [action.name for action in task.actions
+                          if action.name not in used_actions]
+        if unused_actions:
+            unused_objects = [obj.name for obj in task.objects
+                              if obj.name not in objects_of_used_actions]
+            yield self._get_successor(state, unused_actions, unused_objects)
+            if unused_objects:
+                yield self._get_successor(state, unused_actions, [])
+        unused_objects = [obj.name for obj in task.objects
+                          if obj.name not in objects_of_all_actions]
+        if unused_objects:
+            yield self._get_successor(state, [], unused_objects)
+
+    def _get_successor(self, state, action_names, object_names):
+        child_task = state[KEY_IN_STATE]
+        for name in action_names:
+            child_task = child_task.accept(
+                visitors.TaskElementEraseActionVisitor(name))
+        if object_names:
+            child_task = child_task.accept(
+                visitors.TaskElementEraseObjectsVisitor(object_names))
+        return _make_successor(
+            state, child_task,
+            f"Removed {len(action_names)} actions and "
+            f"{len(object_names)} objects not used in the plan. "
+            f"Remaining actions: {len(child_task.actions)}, "
+            f"remaining objects: {len(child_task.objects)}")
@@ -0,0 +1,135 @@
+"""
+Indices into the elements of a PDDL task that let successor generators and
+visitors find the parts of a task affected by a transformation without
+scanning the whole task.
+"""
+from collections import Counter, defaultdict
+
+from machetli.pddl.downward.pddl import Literal
+
+
+def iter_literals(condition):
+    """
+    Yield all literals occurring in *condition*.
+    """
+    if isinstance(condition, Literal):
+        yield condition
+    else:
+        for part in condition.parts:
+            yield from iter_literals(part)
+
+
+def iter_action_literals(action):
+    """
+    Yield all literals in the precondition, effect conditions, and effects
+    of *action*.
+    """
+    yield from iter_literals(action.precondition)
+    for effect in action.effects:
+        yield from iter_literals(effect.condition)
+        yield effect.literal
+
+
+def _get_objects(literals):
+    return {arg for literal in literals for arg in literal.args
+            if not arg.startswith("?")}
+
+
+def _get_predicates(literals):
+    return {literal.predicate for literal in literals}
+
+
+class NameOccurrences:
+    """
+    Index from names (of objects or predicates) to the elements of a task
+    that mention them. For each name, ``init[name]``, ``actions[name]``,
+    and ``axioms[name]`` are sorted lists of indices into the corresponding
+    lists of the task, and ``name in goal`` holds if the goal mentions the
+    name. ``num_literals[name]`` counts the literals of the task that
+    mention the name.
+    """
+    def __init__(self):
+        self.init = defaultdict(list)
+        self.goal = set()
+        self.actions = defaultdict(list)
+        self.axioms = defaultdict(list)
+        self.num_literals = Counter()
+
+    def get_num_occurrences(self, name):
+        """
+        Return the number of literals of the task mentioning *name*.
+        """
+        return self.num_literals[name]
+
+    def get_init_indices(self, names):
+        """
+        Return the sorted indices of all facts of the initial state
+        mentioning one of *names*.
+        """
+        return _get_indices(self.init, names)
+
+    def get_action_indices(self, names):
+        """
+        Return the sorted indices of all actions mentioning one of *names*.
+        """
+        return _get_indices(self.actions, names)
+
+    def get_axiom_indices(self, names):
+        """
+        Return the sorted indices of all axioms mentioning one of *names*.
+        """
+        return _get_indices(self.axioms, names)
+
+    def is_in_goal(self, names):
+        """
+        Return whether the goal mentions one of *names*.
+        """
+        return not self.goal.isdisjoint(names)
+
+
+def _get_indices(index, names):
+    names = [name for name in names if name in index]
+    if len(names) == 1:
+        return index[names[0]]
+    return sorted({i for name in names for i in index[name]})
+
+
+class TaskOccurrences:
+    """
+    Index from the objects and predicates of *task* to the facts of the
+    initial state, the goal, and the actions and axioms that mention them.
+    ``objects`` and ``predicates`` are :class:`NameOccurrences`. An object
+    is mentioned by a literal if it is one of its arguments; an axiom also
+    mentions its parameters and the predicate it derives.
+
+    The index refers to the task it was built from and has to be rebuilt
+    after the task changes.
+    """
+    def __init__(self, task):
+        self.objects = NameOccurrences()
+        self.predicates = NameOccurrences()
+        for fact_id, fact in enumerate(task.init):
+            if isinstance(fact, Literal):
+                self._add("init", fact_id, [fact])
+        goal_literals = list(iter_literals(task.goal))
+        self.objects.goal.update(_get_objects(goal_literals))
+        self.predicates.goal.update(_get_predicates(goal_literals))
+        self._count(goal_literals)
+        for action_id, action in enumerate(task.actions):
+            self._add("actions", action_id, list(iter_action_literals(action)))
+        for axiom_id, axiom in enumerate(task.axioms):
+            self._add("axioms", axiom_id, list(iter_literals(axiom.condition)),
+                      objects={par.name for par in axiom.parameters},
+                      predicates={axiom.name})
+
+    def _add(self, kind, element_id, literals, objects=(), predicates=()):
+        for name in _get_objects(literals).union(objects):
+            getattr(self.objects, kind)[name].append(element_id)
+        for name in _get_predicates(literals).union(predicates):
+            getattr(self.predicates, kind)[name].append(element_id)
+        self._count(literals)
+
+    def _count(self, literals):
+        for literal in literals:
+            self.predicates.num_literals[literal.predicate] += 1
+            self.objects.num_literals.update(literal.args)
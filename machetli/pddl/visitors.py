@@ -1,10 +1,14 @@
+import copy
 import io
 from contextlib import redirect_stdout
 
 from machetli.pddl.downward.pddl import Task, TypedObject, Predicate, Action, \
     Axiom, Function, Truth, Conjunction, Disjunction, Falsity, \
-    UniversalCondition, ExistentialCondition, Atom, NegatedAtom, Effect, Assign
+    UniversalCondition, ExistentialCondition, Atom, NegatedAtom, Effect
 from machetli.pddl.downward.pddl.conditions import ConstantCondition
+from machetli.pddl.occurrences import TaskOccurrences
+
+DUMMY_AXIOM_TRIGGER = "dummy_axiom_trigger"
 
 
 class TaskElementVisitor:
@@ -77,109 +81,187 @@ class TaskElementVisitor:
         raise NotImplementedError
 
 
-class TaskElementErasePredicateVisitor(TaskElementVisitor):
-    """Partial implementation of TaskElementVisitor interface for predicate deletion."""
-
-    def __init__(self, predicate_name):
-        self.predicate_name = predicate_name
-
-    def visit_task(self, task):
-        new_predicates = [
-            predicate for predicate in task.predicates if predicate.name != self.predicate_name]
-
-        new_init = [atom for atom in task.init if isinstance(atom, Assign)
-                    or atom.predicate != self.predicate_name]
-
-        new_goal = task.goal.accept(self)
-
-        new_actions = []
-        for action in task.actions:
-            new_actions.append(action.accept(self))
-        new_actions = [action for action in new_actions if
-                       action.effects and not isinstance(action.precondition, Falsity)]
-
-        new_axioms = []
-        for axiom in task.axioms:
-            new_axioms.append(axiom.accept(self))
-
-        # axioms whose (head became empty OR condition became falsity) were returned as None and must be filtered out
-        new_axioms = [axiom for axiom in new_axioms if axiom is not None]
-        is_dummy_trigger_added = False
-        trigger_id = "dummy_axiom_trigger"
-        for ax in new_axioms:
-            if isinstance(ax.condition, Truth):  # dummy axiom trigger needs to be created
-                if not is_dummy_trigger_added:
-                    dummy_axiom_trigger = Predicate(trigger_id, [])
-                    new_predicates.append(dummy_axiom_trigger)
-                    new_init.append(Atom(trigger_id, []))
-                    is_dummy_trigger_added = True
-                ax.condition = Atom(trigger_id, [])
-
-        return Task(task.domain_name, task.task_name, task.requirements, task.types, task.objects, new_predicates,
-                    task.functions, new_init, new_goal, new_actions, new_axioms, task.use_min_cost_metric)
+def _remove_indices(elements, indices):
+    # Return a copy of elements without the elements at the given sorted
+    # indices.
+    if not indices:
+        return elements
+    result = []
+    start = 0
+    for index in indices:
+        result.extend(elements[start:index])
+        start = index + 1
+    result.extend(elements[start:])
+    return result
+
+
+def _visit_indices(elements, indices, visit):
+    # Return a copy of elements where the elements at the given indices are
+    # replaced by the result of visit. Elements for which visit returns None
+    # are removed. All other elements are shared with the original list.
+    if not indices:
+        return elements
+    result = list(elements)
+    for index in indices:
+        result[index] = visit(elements[index])
+    return [element for element in result if element is not None]
+
+
+def _visit_affected_actions(visitor, actions, indices):
+    def visit(action):
+        new_action = action.accept(visitor)
+        # Filter out actions that became trivial in the transformation.
+        if (new_action and new_action.effects and
+                not isinstance(new_action.precondition, Falsity)):
+            return new_action
+        return None
+    return _visit_indices(actions, indices, visit)
+
+
+def _visit_affected_axioms(visitor, axioms, indices):
+    # Axioms whose head became empty or whose condition became falsity are
+    # returned as None and removed. Axioms whose condition became truth are
+    # triggered by a dummy atom instead. Return the new axioms and whether
+    # the dummy atom is used.
+    is_trigger_used = False
+
+    def visit(axiom):
+        nonlocal is_trigger_used
+        new_axiom = axiom.accept(visitor)
+        if new_axiom is not None and isinstance(new_axiom.condition, Truth):
+            # Copy the axiom to avoid changing an axiom shared with the
+            # original task.
+            new_axiom = copy.copy(new_axiom)
+            new_axiom.condition = Atom(DUMMY_AXIOM_TRIGGER, [])
+            is_trigger_used = True
+        return new_axiom
+
+    return _visit_indices(axioms, indices, visit), is_trigger_used
+
+
+def _add_axiom_trigger(predicates, init):
+    # Return copies of predicates and init that contain the predicate and
+    # the initially true atom triggering axioms with an empty condition.
+    if any(predicate.name == DUMMY_AXIOM_TRIGGER for predicate in predicates):
+        return predicates, init
+    return (predicates + [Predicate(DUMMY_AXIOM_TRIGGER, [])],
+            init + [Atom(DUMMY_AXIOM_TRIGGER, [])])
+
+
+class TaskElementTransformVisitor(TaskElementVisitor):
+    """
+    Partial implementation of TaskElementVisitor interface for visitors that
+    transform conditions, actions, and axioms. A node is only reconstructed
+    if one of its children changed. Otherwise, the node itself is returned,
+    so the result shares all unchanged parts with the visited element.
+    Subclasses implement :meth:`visit_condition_atom` and
+    :meth:`visit_condition_negated_atom`.
+    """
+
+    def _visit_parts(self, condition):
+        new_parts = [part.accept(self) for part in condition.parts]
+        if all(new_part is part for new_part, part in zip(new_parts, condition.parts)):
+            return condition
+        # The parts are already simplified, so only this node has to be.
+        return condition._simplified(new_parts)
 
     def visit_condition_falsity(self, falsity):
-        return Falsity()
+        return falsity
 
     def visit_condition_truth(self, truth):
-        return Truth()
+        return truth
 
     def visit_condition_conjunction(self, conjunction):
-        new_parts = []
-        for part in conjunction.parts:
-            new_parts.append(self.visit_condition(part))
-        return Conjunction(new_parts).simplified()
+        return self._visit_parts(conjunction)
 
     def visit_condition_disjunction(self, disjunction):
-        new_parts = []
-        for part in disjunction.parts:
-            new_parts.append(self.visit_condition(part))
-        return Disjunction(new_parts).simplified()
+        return self._visit_parts(disjunction)
 
     def visit_condition_universal(self, universal_condition):
-        new_parts = []
-        for part in universal_condition.parts:
-            new_parts.append(self.visit_condition(part))
-        return UniversalCondition(universal_condition.parameters, new_parts).simplified()
+        return self._visit_parts(universal_condition)
 
     def visit_condition_existential(self, existential_condition):
-        new_parts = []
-        for part in existential_condition.parts:
-            new_parts.append(self.visit_condition(part))
-        return ExistentialCondition(existential_condition.parameters, new_parts).simplified()
+        return self._visit_parts(existential_condition)
 
     def visit_action(self, action):
         new_precondition = action.precondition.accept(self)
-
-        # maybe parameters will have to be updated after predicate is deleted
-        new_parameters = action.parameters
-        new_num_external_parameters = action.num_external_parameters
-        new_effects = []
-        for effect in action.effects:
-            new_effects.append(effect.accept(self))
+        new_effects = [effect.accept(self) for effect in action.effects]
         new_effects = [eff for eff in new_effects if
                        eff is not None and not isinstance(eff.literal, ConstantCondition) and not isinstance(
                            eff.condition, Falsity)]
-
-        # name stays the same
-        # cost stays the same
-        return Action(action.name, new_parameters, new_num_external_parameters, new_precondition, new_effects,
-                      action.cost)
+        if (new_precondition is action.precondition and
+                len(new_effects) == len(action.effects) and
+                all(new is old for new, old in zip(new_effects, action.effects))):
+            return action
+
+        # Name, parameters, and cost stay the same. Copying the action
+        # avoids uniquifying its variables again.
+        new_action = copy.copy(action)
+        new_action.precondition = new_precondition
+        new_action.effects = new_effects
+        return new_action
 
     def visit_action_effect(self, effect):
         new_condition = effect.condition.accept(self)
         # parameters stay the same
         new_literal = effect.literal.accept(self)
+        if new_condition is effect.condition and new_literal is effect.literal:
+            return effect
         return Effect(effect.parameters, new_condition, new_literal)
 
     def visit_axiom(self, axiom):
-        if axiom.name == self.predicate_name:  # axiom head is about to be deleted
-            return None
         new_condition = axiom.condition.accept(self)
         if isinstance(new_condition, Falsity):  # axiom will never fire
             return None
-        #  truth conditions are handled in visit_task
-        return Axiom(axiom.name, axiom.parameters, axiom.num_external_parameters, new_condition)
+        if new_condition is axiom.condition:
+            return axiom
+        #  truth conditions are handled in _visit_affected_axioms
+        new_axiom = copy.copy(axiom)
+        new_axiom.condition = new_condition
+        return new_axiom
+
+
+class TaskElementErasePredicateVisitor(TaskElementTransformVisitor):
+    """
+    Partial implementation of TaskElementVisitor interface for predicate
+    deletion. Only the parts of the task that mention the predicate are
+    visited, all other parts are shared with the original task. Pass the
+    :class:`TaskOccurrences <machetli.pddl.occurrences.TaskOccurrences>` of
+    the task as *occurrences* to avoid rebuilding them for every visitor.
+    """
+
+    def __init__(self, predicate_name, occurrences=None):
+        self.predicate_name = predicate_name
+        self.occurrences = occurrences
+
+    def visit_task(self, task):
+        occurrences = (self.occurrences or TaskOccurrences(task)).predicates
+        names = [self.predicate_name]
+
+        new_predicates = [
+            predicate for predicate in task.predicates if predicate.name != self.predicate_name]
+
+        new_init = _remove_indices(task.init, occurrences.get_init_indices(names))
+
+        if occurrences.is_in_goal(names):
+            new_goal = task.goal.accept(self)
+        else:
+            new_goal = task.goal
+
+        new_actions = _visit_affected_actions(
+            self, task.actions, occurrences.get_action_indices(names))
+        new_axioms, is_trigger_used = _visit_affected_axioms(
+            self, task.axioms, occurrences.get_axiom_indices(names))
+        if is_trigger_used:
+            new_predicates, new_init = _add_axiom_trigger(new_predicates, new_init)
+
+        return Task(task.domain_name, task.task_name, task.requirements, task.types, task.objects, new_predicates,
+                    task.functions, new_init, new_goal, new_actions, new_axioms, task.use_min_cost_metric)
+
+    def visit_axiom(self, axiom):
+        if axiom.name == self.predicate_name:  # axiom head is about to be deleted
+            return None
+        return super().visit_axiom(axiom)
 
 
 class TaskElementErasePredicateTrueAtomVisitor(TaskElementErasePredicateVisitor):
@@ -245,121 +327,67 @@ class TaskElementEraseActionVisitor(TaskElementVisitor):
                     task.functions, task.init, task.goal, new_actions, task.axioms, task.use_min_cost_metric)
 
 
-class TaskElementEraseObjectVisitor(TaskElementVisitor):
-    """Deletes objects from PDDL tasks."""
+class TaskElementEraseObjectsVisitor(TaskElementTransformVisitor):
+    """
+    Deletes a set of objects from PDDL tasks. Only the parts of the task
+    that mention the objects are visited, all other parts are shared with
+    the original task. Pass the :class:`TaskOccurrences
+    <machetli.pddl.occurrences.TaskOccurrences>` of the task as
+    *occurrences* to avoid rebuilding them for every visitor.
+    """
     # TODO: this it not a visitor but we'll deal with this in issue 62
 
-    def __init__(self, object_name):
-        self.object_name = object_name
+    def __init__(self, object_names, occurrences=None):
+        self.object_names = set(object_names)
+        self.occurrences = occurrences
 
     def visit_task(self, task):
-        new_objects = [o for o in task.objects if o.name != self.object_name]
-
-        new_init = [atom for atom in task.init if isinstance(atom, Assign)
-                    or self.object_name not in atom.args]
-
-        new_goal = task.goal.accept(self)
-
-        new_actions = []
-        for action in task.actions:
-            new_actions.append(action.accept(self))
-        # Filter out actions that became trivial in teh transformation.
-        new_actions = [action for action in new_actions if
-                       action and action.effects and not isinstance(action.precondition, Falsity)]
-
-        new_axioms = []
-        for axiom in task.axioms:
-            new_axioms.append(axiom.accept(self))
-
-        # axioms whose (head became empty OR condition became falsity) were returned as None and must be filtered out
-        new_axioms = [axiom for axiom in new_axioms if axiom is not None]
-        is_dummy_trigger_added = False
-        trigger_id = "dummy_axiom_trigger"
-        new_predicates = list(task.predicates)
-        for ax in new_axioms:
-            if isinstance(ax.condition, Truth):  # dummy axiom trigger needs to be created
-                if not is_dummy_trigger_added:
-                    dummy_axiom_trigger = Predicate(trigger_id, [])
-                    new_predicates.append(dummy_axiom_trigger)
-                    new_init.append(Atom(trigger_id, []))
-                    is_dummy_trigger_added = True
-                ax.condition = Atom(trigger_id, [])
+        occurrences = (self.occurrences or TaskOccurrences(task)).objects
+        names = self.object_names
 
-        return Task(task.domain_name, task.task_name, task.requirements, task.types, new_objects, new_predicates,
-                    task.functions, new_init, new_goal, new_actions, new_axioms, task.use_min_cost_metric)
+        new_objects = [o for o in task.objects if o.name not in self.object_names]
 
-    def visit_condition_falsity(self, falsity):
-        return Falsity()
-
-    def visit_condition_truth(self, truth):
-        return Truth()
-
-    def visit_condition_conjunction(self, conjunction):
-        new_parts = []
-        for part in conjunction.parts:
-            new_parts.append(self.visit_condition(part))
-        return Conjunction(new_parts).simplified()
-
-    def visit_condition_disjunction(self, disjunction):
-        new_parts = []
-        for part in disjunction.parts:
-            new_parts.append(self.visit_condition(part))
-        return Disjunction(new_parts).simplified()
+        new_init = _remove_indices(task.init, occurrences.get_init_indices(names))
 
-    def visit_condition_universal(self, universal_condition):
-        new_parts = []
-        for part in universal_condition.parts:
-            new_parts.append(self.visit_condition(part))
-        return UniversalCondition(universal_condition.parameters, new_parts).simplified()
-
-    def visit_condition_existential(self, existential_condition):
-        new_parts = []
-        for part in existential_condition.parts:
-            new_parts.append(self.visit_condition(part))
-        return ExistentialCondition(existential_condition.parameters, new_parts).simplified()
-
-    def visit_action(self, action):
-        new_precondition = action.precondition.accept(self)
+        if occurrences.is_in_goal(names):
+            new_goal = task.goal.accept(self)
+        else:
+            new_goal = task.goal
 
-        # maybe parameters will have to be updated after object is deleted
-        new_parameters = action.parameters
-        new_num_external_parameters = action.num_external_parameters
-        new_effects = []
-        for effect in action.effects:
-            new_effects.append(effect.accept(self))
-        new_effects = [eff for eff in new_effects if
-                       eff is not None and not isinstance(eff.literal, ConstantCondition) and not isinstance(
-                           eff.condition, Falsity)]
+        new_actions = _visit_affected_actions(
+            self, task.actions, occurrences.get_action_indices(names))
 
-        # name stays the same
-        # cost stays the same
-        return Action(action.name, new_parameters, new_num_external_parameters, new_precondition, new_effects,
-                      action.cost)
+        new_predicates = task.predicates
+        new_axioms, is_trigger_used = _visit_affected_axioms(
+            self, task.axioms, occurrences.get_axiom_indices(names))
+        if is_trigger_used:
+            new_predicates, new_init = _add_axiom_trigger(new_predicates, new_init)
 
-    def visit_action_effect(self, effect):
-        new_condition = effect.condition.accept(self)
-        # parameters stay the same
-        new_literal = effect.literal.accept(self)
-        return Effect(effect.parameters, new_condition, new_literal)
+        return Task(task.domain_name, task.task_name, task.requirements, task.types, new_objects, new_predicates,
+                    task.functions, new_init, new_goal, new_actions, new_axioms, task.use_min_cost_metric)
 
     def visit_axiom(self, axiom):
-        if self.object_name in axiom.parameters:  # axiom head is about to be deleted
+        if any(par.name in self.object_names for par in axiom.parameters):  # axiom head is about to be deleted
             return None
-        new_condition = axiom.condition.accept(self)
-        if isinstance(new_condition, Falsity):  # axiom will never fire
-            return None
-        #  truth conditions are handled in visit_task
-        return Axiom(axiom.name, axiom.parameters, axiom.num_external_parameters, new_condition)
+        return super().visit_axiom(axiom)
 
     def visit_condition_atom(self, atom):
-        if self.object_name in atom.args:
+        if not self.object_names.isdisjoint(atom.args):
             return Falsity()
         else:
             return atom
 
     def visit_condition_negated_atom(self, negated_atom):
-        if self.object_name in negated_atom.args:
+        if not self.object_names.isdisjoint(negated_atom.args):
             return Truth()
         else:
             return negated_atom
 
+
+class TaskElementEraseObjectVisitor(TaskElementEraseObjectsVisitor):
+    """Deletes objects from PDDL tasks."""
+
+    def __init__(self, object_name, occurrences=None):
+        super().__init__([object_name], occurrences)
+        self.object_name = object_name
+
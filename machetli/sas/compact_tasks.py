@@ -0,0 +1,471 @@
+r"""
+Columnar representation of SAS\ :sup:`+` tasks. Instead of storing each
+condition and effect as Python tuples inside lists inside operator objects, a
+:class:`CompactSASTask` stores all facts of a kind in one flat integer array
+and uses offset arrays to find the facts belonging to each operator, effect,
+axiom, or mutex group. This uses much less memory than :class:`SASTask
+<machetli.sas.sas_tasks.SASTask>` and makes copying and pickling tasks fast.
+"""
+from array import array
+import pickle
+
+from machetli.sas.sas_tasks import SASTask, SASVariables, SASMutexGroup, \
+    SASInit, SASGoal, SASOperator, SASAxiom, SAS_FILE_VERSION
+from machetli.sas.validation import validate_compact_task
+
+INT_TYPECODE = "i"
+"""
+Type code of all integer arrays in a :class:`CompactSASTask` (see the module
+:mod:`array`).
+"""
+
+
+ARRAY_FIELDS = (
+    "ranges", "axiom_layers", "mutex_offsets", "mutex_facts", "init",
+    "goal_facts", "operator_costs", "prevail_offsets", "prevail_facts",
+    "effect_offsets", "effects", "effect_condition_offsets",
+    "effect_condition_facts", "axiom_condition_offsets",
+    "axiom_condition_facts", "axiom_effects")
+"""
+Names of the integer arrays of a :class:`CompactSASTask`.
+"""
+
+
+def _int_array(values=()):
+    return array(INT_TYPECODE, values)
+
+
+def _pairs(facts, start, end):
+    # Facts are stored as consecutive (var, value) entries, so the i-th fact
+    # occupies the entries 2*i and 2*i+1.
+    return [(facts[2 * i], facts[2 * i + 1]) for i in range(start, end)]
+
+
+def _append_run(offsets, values, width, start, end, new_offsets, new_values):
+    # Append the entries of the elements start to end - 1 described by
+    # offsets and values (with width entries per item) to new_offsets and
+    # new_values, shifting the offsets accordingly.
+    first = offsets[start]
+    shift = len(new_values) // width - first
+    new_values.extend(values[width * first:width * offsets[end]])
+    new_offsets.extend(offset + shift for offset in offsets[start + 1:end + 1])
+
+
+class CompactSASTask:
+    """
+    Planning task in finite-domain representation backed by flat integer
+    arrays. All facts are stored as consecutive (variable, value) entries in
+    the arrays ``*_facts``; for each operator, effect, axiom, and mutex group,
+    the arrays ``*_offsets`` contain the index of its first fact, with one
+    additional entry at the end. For example, the prevail conditions of
+    operator ``i`` are the facts ``prevail_offsets[i]`` to
+    ``prevail_offsets[i + 1] - 1`` of ``prevail_facts``. Effects are stored as
+    (variable, precondition, postcondition) triples in ``effects``.
+
+    Use :meth:`from_task` and :meth:`to_task` to convert from and to
+    :class:`SASTask <machetli.sas.sas_tasks.SASTask>`. The conversion is
+    lossless in both directions.
+
+    The arrays are never modified after the task is created, so tasks
+    derived with :meth:`without_operators` and :meth:`without_goals` share
+    all unchanged arrays with the original task. The generators
+    :class:`RemoveOperators <machetli.sas.RemoveOperators>`,
+    :class:`RemoveOperatorGroups
+    <machetli.sas.RemoveOperatorGroups>`, and
+    :class:`RemoveGoals <machetli.sas.RemoveGoals>` work directly
+    on compact tasks. All other generators convert the task to a
+    :class:`SASTask <machetli.sas.sas_tasks.SASTask>` and compact their
+    successors again, so for them compact tasks only save memory and time
+    when storing and copying states.
+    """
+
+    def __init__(self, ranges, axiom_layers, value_names,
+                 mutex_offsets, mutex_facts, init, goal_facts,
+                 operator_names, operator_costs, prevail_offsets,
+                 prevail_facts, effect_offsets, effects,
+                 effect_condition_offsets, effect_condition_facts,
+                 axiom_condition_offsets, axiom_condition_facts,
+                 axiom_effects, metric):
+        self.ranges = ranges
+        self.axiom_layers = axiom_layers
+        self.value_names = value_names
+        self.mutex_offsets = mutex_offsets
+        self.mutex_facts = mutex_facts
+        self.init = init
+        self.goal_facts = goal_facts
+        self.operator_names = operator_names
+        self.operator_costs = operator_costs
+        self.prevail_offsets = prevail_offsets
+        self.prevail_facts = prevail_facts
+        self.effect_offsets = effect_offsets
+        self.effects = effects
+        self.effect_condition_offsets = effect_condition_offsets
+        self.effect_condition_facts = effect_condition_facts
+        self.axiom_condition_offsets = axiom_condition_offsets
+        self.axiom_condition_facts = axiom_condition_facts
+        self.axiom_effects = axiom_effects
+        self.metric = metric
+        self._encoding_size = None
+
+    def __reduce_ex__(self, protocol):
+        if protocol < 5:
+            return super().__reduce_ex__(protocol)
+        # From protocol 5 on, pickle can store the arrays out of band (see
+        # machetli.state_codecs.OutOfBandPickleCodec).
+        attributes = dict(self.__dict__)
+        buffers = {field: pickle.PickleBuffer(attributes.pop(field))
+                   for field in ARRAY_FIELDS}
+        return _restore_compact_task, (attributes, buffers)
+
+    @classmethod
+    def from_task(cls, task: SASTask):
+        """
+        Create a compact copy of the :class:`SASTask
+        <machetli.sas.sas_tasks.SASTask>` *task*.
+        """
+        builder = CompactSASTaskBuilder(task.variables.ranges,
+                                        task.variables.axiom_layers,
+                                        task.variables.value_names)
+        for mutex in task.mutexes:
+            builder.add_mutex_group(mutex.facts)
+        builder.set_init(task.init.values)
+        builder.set_goal(task.goal.pairs)
+        for op in task.operators:
+            builder.add_operator(op.name, op.prevail, op.pre_post, op.cost)
+        for axiom in task.axioms:
+            builder.add_axiom(axiom.condition, axiom.effect)
+        compact_task = builder.build(task.metric)
+        compact_task._encoding_size = task._encoding_size
+        return compact_task
+
+    def to_task(self) -> SASTask:
+        """
+        Create a :class:`SASTask <machetli.sas.sas_tasks.SASTask>` with the
+        same content as this task.
+        """
+        variables = SASVariables(list(self.ranges), list(self.axiom_layers),
+                                 [list(names) for names in self.value_names])
+        mutexes = [SASMutexGroup(self.get_mutex_facts(i))
+                   for i in range(self.num_mutexes)]
+        init = SASInit(list(self.init))
+        goal = SASGoal(_pairs(self.goal_facts, 0, len(self.goal_facts) // 2))
+        operators = [
+            SASOperator(self.operator_names[i], self.get_prevail(i),
+                        self.get_pre_post(i), self.operator_costs[i],
+                        is_canonical=True)
+            for i in range(self.num_operators)]
+        axioms = [SASAxiom(self.get_axiom_condition(i),
+                           self.get_axiom_effect(i))
+                  for i in range(self.num_axioms)]
+        # Operators and axioms are stored in sorted and canonical form.
+        return SASTask(variables, mutexes, init, goal, operators, axioms,
+                       self.metric, sort=False,
+                       encoding_size=self._encoding_size)
+
+    @property
+    def num_variables(self):
+        return len(self.ranges)
+
+    @property
+    def num_mutexes(self):
+        return len(self.mutex_offsets) - 1
+
+    @property
+    def num_operators(self):
+        return len(self.operator_names)
+
+    @property
+    def num_axioms(self):
+        return len(self.axiom_effects) // 2
+
+    def get_mutex_facts(self, mutex_id):
+        return _pairs(self.mutex_facts, self.mutex_offsets[mutex_id],
+                      self.mutex_offsets[mutex_id + 1])
+
+    def get_prevail(self, op_id):
+        return _pairs(self.prevail_facts, self.prevail_offsets[op_id],
+                      self.prevail_offsets[op_id + 1])
+
+    def get_pre_post(self, op_id):
+        pre_post = []
+        for eff_id in range(self.effect_offsets[op_id],
+                            self.effect_offsets[op_id + 1]):
+            var, pre, post = self.effects[3 * eff_id:3 * eff_id + 3]
+            cond = _pairs(self.effect_condition_facts,
+                          self.effect_condition_offsets[eff_id],
+                          self.effect_condition_offsets[eff_id + 1])
+            pre_post.append((var, pre, post, cond))
+        return pre_post
+
+    def get_operator_encoding_size(self, op_id):
+        """
+        Return the same encoding size as :meth:`SASOperator.get_encoding_size
+        <machetli.sas.sas_tasks.SASOperator.get_encoding_size>` for the
+        operator with index *op_id*.
+        """
+        effect_start = self.effect_offsets[op_id]
+        effect_end = self.effect_offsets[op_id + 1]
+        num_preconditions = sum(
+            1 for eff_id in range(effect_start, effect_end)
+            if self.effects[3 * eff_id + 1] != -1)
+        return (1 + self.prevail_offsets[op_id + 1] -
+                self.prevail_offsets[op_id] +
+                effect_end - effect_start + num_preconditions +
+                self.effect_condition_offsets[effect_end] -
+                self.effect_condition_offsets[effect_start])
+
+    def without_operators(self, op_ids):
+        """
+        Return a copy of this task without the operators with the indices
+        *op_ids*. All arrays that do not describe operators are shared with
+        this task.
+        """
+        removed = sorted(set(op_ids))
+        operator_names = []
+        operator_costs = _int_array()
+        prevail_offsets = _int_array([0])
+        prevail_facts = _int_array()
+        effect_offsets = _int_array([0])
+        effects = _int_array()
+        effect_condition_offsets = _int_array([0])
+        effect_condition_facts = _int_array()
+        # Copy the runs of consecutive operators between removed ones.
+        start = 0
+        for end in removed + [self.num_operators]:
+            if start < end:
+                operator_names.extend(self.operator_names[start:end])
+                operator_costs.extend(self.operator_costs[start:end])
+                _append_run(self.prevail_offsets, self.prevail_facts, 2,
+                            start, end, prevail_offsets, prevail_facts)
+                _append_run(self.effect_offsets, self.effects, 3, start, end,
+                            effect_offsets, effects)
+                _append_run(self.effect_condition_offsets,
+                            self.effect_condition_facts, 2,
+                            self.effect_offsets[start],
+                            self.effect_offsets[end],
+                            effect_condition_offsets, effect_condition_facts)
+            start = end + 1
+        task = CompactSASTask(
+            self.ranges, self.axiom_layers, self.value_names,
+            self.mutex_offsets, self.mutex_facts, self.init, self.goal_facts,
+            operator_names, operator_costs, prevail_offsets, prevail_facts,
+            effect_offsets, effects, effect_condition_offsets,
+            effect_condition_facts, self.axiom_condition_offsets,
+            self.axiom_condition_facts, self.axiom_effects, self.metric)
+        if self._encoding_size is not None:
+            task._encoding_size = self._encoding_size - sum(
+                self.get_operator_encoding_size(op_id) for op_id in removed)
+        return task
+
+    def without_goals(self, goal_ids):
+        """
+        Return a copy of this task without the goal facts with the indices
+        *goal_ids*. All other arrays are shared with this task.
+        """
+        removed = set(goal_ids)
+        goal_facts = _int_array()
+        for goal_id in range(len(self.goal_facts) // 2):
+            if goal_id not in removed:
+                goal_facts.extend(self.goal_facts[2 * goal_id:2 * goal_id + 2])
+        task = CompactSASTask(
+            self.ranges, self.axiom_layers, self.value_names,
+            self.mutex_offsets, self.mutex_facts, self.init, goal_facts,
+            self.operator_names, self.operator_costs, self.prevail_offsets,
+            self.prevail_facts, self.effect_offsets, self.effects,
+            self.effect_condition_offsets, self.effect_condition_facts,
+            self.axiom_condition_offsets, self.axiom_condition_facts,
+            self.axiom_effects, self.metric)
+        if self._encoding_size is not None:
+            task._encoding_size = self._encoding_size - len(removed)
+        return task
+
+    def get_axiom_condition(self, axiom_id):
+        return _pairs(self.axiom_condition_facts,
+                      self.axiom_condition_offsets[axiom_id],
+                      self.axiom_condition_offsets[axiom_id + 1])
+
+    def get_axiom_effect(self, axiom_id):
+        return (self.axiom_effects[2 * axiom_id],
+                self.axiom_effects[2 * axiom_id + 1])
+
+    def validate(self):
+        """
+        Fail an assertion if the task is invalid. See
+        :meth:`SASTask.validate <machetli.sas.sas_tasks.SASTask.validate>` for
+        the conditions a valid task has to satisfy. The checks run directly
+        on the arrays of this task and are vectorized if NumPy is installed
+        (see :mod:`machetli.sas.validation`).
+        """
+        validate_compact_task(self)
+
+    def output(self, stream):
+        """
+        Write the task to *stream* in the format of SAS\\ :sup:`+` files. The
+        output is identical to the output of the corresponding :class:`SASTask
+        <machetli.sas.sas_tasks.SASTask>`.
+        """
+        lines = ["begin_version", str(SAS_FILE_VERSION), "end_version",
+                 "begin_metric", str(int(self.metric)), "end_metric",
+                 str(self.num_variables)]
+        for var, (rang, axiom_layer, values) in enumerate(zip(
+                self.ranges, self.axiom_layers, self.value_names)):
+            lines += ["begin_variable", "var%d" % var, str(axiom_layer),
+                      str(rang)]
+            lines += values
+            lines.append("end_variable")
+        lines.append(str(self.num_mutexes))
+        for mutex_id in range(self.num_mutexes):
+            facts = self.get_mutex_facts(mutex_id)
+            lines += ["begin_mutex_group", str(len(facts))]
+            lines += ["%d %d" % fact for fact in facts]
+            lines.append("end_mutex_group")
+        lines.append("begin_state")
+        lines += map(str, self.init)
+        lines += ["end_state", "begin_goal", str(len(self.goal_facts) // 2)]
+        lines += ["%d %d" % fact for fact in
+                  _pairs(self.goal_facts, 0, len(self.goal_facts) // 2)]
+        lines += ["end_goal", str(self.num_operators)]
+        for op_id in range(self.num_operators):
+            prevail = self.get_prevail(op_id)
+            pre_post = self.get_pre_post(op_id)
+            lines += ["begin_operator", self.operator_names[op_id][1:-1],
+                      str(len(prevail))]
+            lines += ["%d %d" % fact for fact in prevail]
+            lines.append(str(len(pre_post)))
+            for var, pre, post, cond in pre_post:
+                cond_str = "".join("%d %d " % fact for fact in cond)
+                lines.append("%d %s%d %d %d" % (len(cond), cond_str, var, pre,
+                                               post))
+            lines += [str(self.operator_costs[op_id]), "end_operator"]
+        lines.append(str(self.num_axioms))
+        for axiom_id in range(self.num_axioms):
+            condition = self.get_axiom_condition(axiom_id)
+            var, val = self.get_axiom_effect(axiom_id)
+            lines += ["begin_rule", str(len(condition))]
+            lines += ["%d %d" % fact for fact in condition]
+            lines += ["%d %d %d" % (var, 1 - val, val), "end_rule"]
+        stream.write("\n".join(lines))
+        stream.write("\n")
+
+    def get_encoding_size(self):
+        """
+        Return the same encoding size as :meth:`SASTask.get_encoding_size
+        <machetli.sas.sas_tasks.SASTask.get_encoding_size>`. Like there, the
+        size is cached.
+        """
+        if self._encoding_size is None:
+            num_preconditions = sum(
+                1 for eff_id in range(len(self.effects) // 3)
+                if self.effects[3 * eff_id + 1] != -1)
+            self._encoding_size = (
+                self.num_variables + sum(self.ranges) +
+                len(self.mutex_facts) // 2 +
+                len(self.goal_facts) // 2 +
+                self.num_operators + len(self.prevail_facts) // 2 +
+                len(self.effects) // 3 + num_preconditions +
+                len(self.effect_condition_facts) // 2 +
+                self.num_axioms + len(self.axiom_condition_facts) // 2)
+        return self._encoding_size
+
+
+def _restore_compact_task(attributes, buffers):
+    task = CompactSASTask.__new__(CompactSASTask)
+    task.__dict__.update(attributes)
+    for field, buffer in buffers.items():
+        values = _int_array()
+        values.frombytes(buffer)
+        setattr(task, field, values)
+    return task
+
+
+class CompactSASTaskBuilder:
+    """
+    Helper class to construct a :class:`CompactSASTask` element by element
+    without keeping Python objects for all operators and axioms in memory.
+    Conditions and effects have to be in the canonical form used by
+    :class:`SASOperator <machetli.sas.sas_tasks.SASOperator>` and
+    :class:`SASAxiom <machetli.sas.sas_tasks.SASAxiom>`. If operators or
+    axioms are not added in the order used by :class:`SASTask
+    <machetli.sas.sas_tasks.SASTask>`, :meth:`build` sorts them.
+    """
+
+    def __init__(self, ranges, axiom_layers, value_names):
+        self.ranges = _int_array(ranges)
+        self.axiom_layers = _int_array(axiom_layers)
+        self.value_names = value_names
+        self.mutex_offsets = _int_array([0])
+        self.mutex_facts = _int_array()
+        self.init = _int_array()
+        self.goal_facts = _int_array()
+        self.operator_names = []
+        self.operator_costs = _int_array()
+        self.prevail_offsets = _int_array([0])
+        self.prevail_facts = _int_array()
+        self.effect_offsets = _int_array([0])
+        self.effects = _int_array()
+        self.effect_condition_offsets = _int_array([0])
+        self.effect_condition_facts = _int_array()
+        self.axiom_condition_offsets = _int_array([0])
+        self.axiom_condition_facts = _int_array()
+        self.axiom_effects = _int_array()
+        self.is_sorted = True
+        self._last_operator_key = None
+        self._last_axiom_key = None
+
+    def add_mutex_group(self, facts):
+        for fact in facts:
+            self.mutex_facts.extend(fact)
+        self.mutex_offsets.append(len(self.mutex_facts) // 2)
+
+    def set_init(self, values):
+        self.init = _int_array(values)
+
+    def set_goal(self, pairs):
+        self.goal_facts = _int_array()
+        for fact in pairs:
+            self.goal_facts.extend(fact)
+
+    def add_operator(self, name, prevail, pre_post, cost):
+        key = (name, prevail, pre_post)
+        last_key = self._last_operator_key
+        if last_key is not None and key < last_key:
+            self.is_sorted = False
+        self._last_operator_key = key
+        self.operator_names.append(name)
+        self.operator_costs.append(cost)
+        for fact in prevail:
+            self.prevail_facts.extend(fact)
+        self.prevail_offsets.append(len(self.prevail_facts) // 2)
+        for var, pre, post, cond in pre_post:
+            self.effects.extend((var, pre, post))
+            for fact in cond:
+                self.effect_condition_facts.extend(fact)
+            self.effect_condition_offsets.append(
+                len(self.effect_condition_facts) // 2)
+        self.effect_offsets.append(len(self.effects) // 3)
+
+    def add_axiom(self, condition, effect):
+        key = (condition, effect)
+        last_key = self._last_axiom_key
+        if last_key is not None and key < last_key:
+            self.is_sorted = False
+        self._last_axiom_key = key
+        for fact in condition:
+            self.axiom_condition_facts.extend(fact)
+        self.axiom_condition_offsets.append(
+            len(self.axiom_condition_facts) // 2)
+        self.axiom_effects.extend(effect)
+
+    def build(self, metric) -> CompactSASTask:
+        task = CompactSASTask(
+            self.ranges, self.axiom_layers, self.value_names,
+            self.mutex_offsets, self.mutex_facts, self.init, self.goal_facts,
+            self.operator_names, self.operator_costs, self.prevail_offsets,
+            self.prevail_facts, self.effect_offsets, self.effects,
+            self.effect_condition_offsets, self.effect_condition_facts,
+            self.axiom_condition_offsets, self.axiom_condition_facts,
+            self.axiom_effects, metric)
+        if not self.is_sorted:
+            # Going through SASTask sorts operators and axioms.
+            task = CompactSASTask.from_task(task.to_task())
+        return task
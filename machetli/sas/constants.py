@@ -1 +1,2 @@
 KEY_IN_STATE = "sas_task"
+KEY_MERGED_OPERATORS = "merged_operators"
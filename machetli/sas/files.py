@@ -1,37 +1,45 @@
+import json
 import logging
 from pathlib import Path
 from pickle import PickleError
 import sys
 from typing import Union
 
-from machetli.sas.constants import KEY_IN_STATE
+from machetli.sas.compact_tasks import CompactSASTask, CompactSASTaskBuilder
+from machetli.sas.constants import KEY_IN_STATE, KEY_MERGED_OPERATORS
 from machetli.sas.sas_tasks import SASTask, SASVariables, SASMutexGroup, \
     SASInit, SASGoal, SASOperator, SASAxiom
 
 from machetli import tools
-from machetli.evaluator import EXIT_CODE_CRITICAL, EXIT_CODE_BEHAVIOR_PRESENT, \
-    EXIT_CODE_BEHAVIOR_NOT_PRESENT
+from machetli.evaluator import EXIT_CODE_CRITICAL, _exit_with_result
 
 
-def generate_initial_state(sas_file: Union[Path, str]) -> dict:
+def generate_initial_state(sas_file: Union[Path, str],
+                           compact: bool = False) -> dict:
     r"""
     Parse the SAS\ :sup:`+` task defined in the SAS\ :sup:`+` file
     `sas_file` and return an initial state containing the parsed
-    SAS\ :sup:`+` task.
+    SAS\ :sup:`+` task. Files with the suffix of a compression format (e.g.,
+    ``output.sas.xz``, see :attr:`COMPRESSION_FORMATS
+    <machetli.tools.COMPRESSION_FORMATS>`) are decompressed while reading
+    them.
+
+    :param compact: if ``True``, store the task as a
+        :class:`CompactSASTask <machetli.sas.compact_tasks.CompactSASTask>`,
+        which needs much less memory for large tasks and is faster to copy and
+        store. All successor generators of this package also create compact
+        tasks in this case.
 
     :return: a dictionary pointing to the SAS\ :sup:`+` task specified
              in the file `sas_file`.
     """
     return {
-        KEY_IN_STATE: _read_task(Path(sas_file))
+        KEY_IN_STATE: _read_task(Path(sas_file), compact)
     }
 
 
 def _run_evaluator_on_sas_file(evaluate, sas_path):
-    if evaluate(sas_path):
-        sys.exit(EXIT_CODE_BEHAVIOR_PRESENT)
-    else:
-        sys.exit(EXIT_CODE_BEHAVIOR_NOT_PRESENT)
+    _exit_with_result(evaluate(sas_path))
 
 
 def run_evaluator(evaluate):
@@ -53,7 +61,10 @@ def run_evaluator(evaluate):
 
     :param evaluate: is a function taking the filename of a SAS\ :sup:`+` file as
         input and returning ``True`` if the specified behavior occurs for the
-        given instance, and ``False`` if it doesn't. Other ways of exiting the
+        given instance, and ``False`` if it doesn't. The function can also
+        return a pair of such a truth value and a dictionary of additional
+        information as described in
+        :meth:`machetli.evaluator.run_evaluator`. Other ways of exiting the
         function (exceptions, ``sys.exit`` with exit codes other than
         :attr:`EXIT_CODE_BEHAVIOR_PRESENT<machetli.evaluator.EXIT_CODE_BEHAVIOR_PRESENT>` or
         :attr:`EXIT_CODE_BEHAVIOR_NOT_PRESENT<machetli.evaluator.EXIT_CODE_BEHAVIOR_NOT_PRESENT>`)
@@ -63,7 +74,7 @@ def run_evaluator(evaluate):
         path = Path(sys.argv[1])
         try:
             state = tools.read_state(path)
-            write_file(state, "task.sas")
+            _write_task(state, "task.sas")
             _run_evaluator_on_sas_file(evaluate, "task.sas")
         except (FileNotFoundError, PickleError):
             _run_evaluator_on_sas_file(evaluate, path)
@@ -74,8 +85,13 @@ def run_evaluator(evaluate):
         sys.exit(EXIT_CODE_CRITICAL)
 
 
-def _read_task(sas_file : Path) -> SASTask:
-    lines = (l for l in sas_file.read_text().splitlines())
+def _read_task(sas_file : Path,
+               compact=False) -> Union[SASTask, CompactSASTask]:
+    with tools.open_file(sas_file) as file:
+        return _parse_task((line.rstrip("\r\n") for line in file), compact)
+
+
+def _parse_task(lines, compact) -> Union[SASTask, CompactSASTask]:
     while True:
         line = next(lines)
         if line == "begin_metric":
@@ -92,18 +108,41 @@ def _read_task(sas_file : Path) -> SASTask:
     init = _read_init_state(lines, num_vars)
     # read goal
     goal = _read_goal(lines)
-    # read operators
-    num_operators = int(next(lines))
-    operators = _read_operators(lines, num_operators)
-    # read axioms
-    num_axioms = int(next(lines))
-    axioms = _read_axioms(lines, num_axioms)
-
-    sas_task = SASTask(variables, mutexes, init, goal, operators, axioms, metric)
+    if compact:
+        sas_task = _read_compact_operators_and_axioms(
+            lines, variables, mutexes, init, goal, metric)
+    else:
+        # read operators
+        num_operators = int(next(lines))
+        operators = list(_read_operators(lines, num_operators))
+        # read axioms
+        num_axioms = int(next(lines))
+        axioms = list(_read_axioms(lines, num_axioms))
+        sas_task = SASTask(variables, mutexes, init, goal, operators, axioms,
+                           metric)
     sas_task.validate()
     return sas_task
 
 
+def _read_compact_operators_and_axioms(lines, variables, mutexes, init, goal,
+                                       metric):
+    # Operators and axioms are added to the builder while they are read, so
+    # we never hold all of them as Python objects at the same time.
+    builder = CompactSASTaskBuilder(
+        variables.ranges, variables.axiom_layers, variables.value_names)
+    for mutex in mutexes:
+        builder.add_mutex_group(mutex.facts)
+    builder.set_init(init.values)
+    builder.set_goal(goal.pairs)
+    num_operators = int(next(lines))
+    for op in _read_operators(lines, num_operators):
+        builder.add_operator(op.name, op.prevail, op.pre_post, op.cost)
+    num_axioms = int(next(lines))
+    for axiom in _read_axioms(lines, num_axioms):
+        builder.add_axiom(axiom.condition, axiom.effect)
+    return builder.build(metric)
+
+
 def _read_variables(lines, num_vars):
     axiom_layers = []
     ranges = []
@@ -158,7 +197,6 @@ def _read_goal(lines):
 
 
 def _read_operators(lines, num_operators):
-    operators = []
     for _ in range(num_operators):
         assert next(lines) == "begin_operator"
         name = "(" + next(lines) + ")"
@@ -180,13 +218,11 @@ def _read_operators(lines, num_operators):
             var, pre, post = effect_line[-3:]
             pre_post.append((var, pre, post, cond))
         cost = int(next(lines))
-        operators.append(SASOperator(name, prevail_conditions, pre_post, cost))
         assert next(lines) == "end_operator"
-    return operators
+        yield SASOperator(name, prevail_conditions, pre_post, cost)
 
 
 def _read_axioms(lines, num_axioms):
-    axioms = []
     for _ in range(num_axioms):
         assert next(lines) == "begin_rule"
         length_body = int(next(lines))
@@ -199,14 +235,55 @@ def _read_axioms(lines, num_axioms):
         val = effect_line[2]
         assert 1 - val == effect_line[1]
         effect = (var, val)
-        axioms.append(SASAxiom(condition, effect))
         assert next(lines) == "end_rule"
-    return axioms
+        yield SASAxiom(condition, effect)
+
+
+MERGED_OPERATORS_SUFFIX = ".merged-operators.json"
+"""
+Suffix appended to the filename passed to :func:`write_file` for the file
+describing operators created by :class:`MergeOperators
+<machetli.sas.generators.MergeOperators>`.
+"""
 
 
 def write_file(state: dict, path: Union[Path, str]):
     """
-    Write the problem represented in `state` to disk.
+    Write the problem represented in `state` to disk. This works for both
+    regular and compact tasks. If `path` has the suffix of a compression
+    format, the file is compressed. If the state contains operators created by
+    :class:`MergeOperators <machetli.sas.generators.MergeOperators>`, a JSON
+    file mapping each of their names to the names of the original operators
+    they combine is written next to it, with :attr:`MERGED_OPERATORS_SUFFIX`
+    appended to the filename.
     """
-    with Path(path).open("w") as file:
+    _write_task(state, path)
+    merged_operators = state.get(KEY_MERGED_OPERATORS)
+    if merged_operators:
+        history = {name: _get_merge_history(merged_operators, name)
+                   for name in merged_operators}
+        history_path = Path(path)
+        history_path = history_path.with_name(
+            history_path.name + MERGED_OPERATORS_SUFFIX)
+        with history_path.open("w") as file:
+            json.dump(history, file, indent=2)
+
+
+def _write_task(state, path):
+    with tools.open_file(path, "w") as file:
         state[KEY_IN_STATE].output(file)
+
+
+def _get_merge_history(merged_operators, name):
+    # Return the names of the original operators that were merged into the
+    # operator called name, in the order in which they are applied.
+    history = []
+    stack = [name]
+    while stack:
+        current = stack.pop()
+        if current in merged_operators:
+            first, second = merged_operators[current]
+            stack += [second, first]
+        else:
+            history.append(current)
+    return history
@@ -1,37 +1,270 @@
 import copy
-import itertools
+import functools
+import heapq
+import logging
 import random
+from collections import defaultdict
 
-from machetli.sas.constants import KEY_IN_STATE
-from machetli.sas.sas_tasks import SASTask, SASMutexGroup, SASInit, SASGoal, \
-    SASOperator, SASAxiom
-from machetli.successors import Successor, SuccessorGenerator, RNG
+from machetli.sas.compact_tasks import CompactSASTask
+from machetli.sas.constants import KEY_IN_STATE, KEY_MERGED_OPERATORS
+from machetli.sas.occurrences import VariableOccurrences
+from machetli.sas.simplification import prune_irrelevant
+from machetli.sas.sas_tasks import SASTask, SASVariables, SASMutexGroup, \
+    SASInit, SASGoal, SASOperator, SASAxiom, operator_sort_key, axiom_sort_key
+from machetli.successors import Successor, SuccessorGenerator, RNG, \
+    get_run_dir_path, get_bisection_chunks, check_order, order_candidates, \
+    ORDER_RANDOM
+from machetli.tools import read_plan
+
+
+def _supports_compact_tasks(get_successors):
+    """
+    Let the method *get_successors* of a generator work on states that contain
+    a :class:`CompactSASTask <machetli.sas.compact_tasks.CompactSASTask>`. The
+    task is expanded once per state and the tasks of all successors are
+    compacted again.
+    """
+    @functools.wraps(get_successors)
+    def wrapper(self, state):
+        task = state[KEY_IN_STATE]
+        if not isinstance(task, CompactSASTask):
+            yield from get_successors(self, state)
+            return
+        expanded_state = dict(state)
+        expanded_state[KEY_IN_STATE] = task.to_task()
+        for successor in get_successors(self, expanded_state):
+            successor.state[KEY_IN_STATE] = CompactSASTask.from_task(
+                successor.state[KEY_IN_STATE])
+            yield successor
+    return wrapper
+
+
+def _insert_sorted(elements, new_elements, key):
+    # Insert new_elements into the list elements, which is sorted by key,
+    # with a binary search for each of them instead of sorting all elements
+    # again. Returns the modified list.
+    for element in new_elements:
+        element_key = key(element)
+        low, high = 0, len(elements)
+        while low < high:
+            middle = (low + high) // 2
+            if key(elements[middle]) <= element_key:
+                low = middle + 1
+            else:
+                high = middle
+        elements.insert(low, element)
+    return elements
+
+
+def _remove_indices(elements, indices):
+    # Return the elements of the list elements whose index is not in the
+    # sorted list indices, preserving their order.
+    result = []
+    start = 0
+    for index in indices:
+        result.extend(elements[start:index])
+        start = index + 1
+    result.extend(elements[start:])
+    return result
+
+
+def _get_combined_pre_post(op):
+    # Return dictionaries mapping variables to the values the operator
+    # requires and leaves behind, or None if it has conditional effects.
+    combined_pre, combined_post = {}, {}
+    for var, value in op.prevail:
+        combined_pre[var] = value
+        combined_post[var] = value
+    for var, pre, post, cond in op.pre_post:
+        if cond:
+            return None
+        if pre != -1:
+            combined_pre[var] = pre
+        combined_post[var] = post
+    return combined_pre, combined_post
+
+
+def _get_operators(task):
+    # Return the names and encoding sizes of all operators of a task or
+    # compact task, without expanding compact tasks.
+    if isinstance(task, CompactSASTask):
+        return [(name, task.get_operator_encoding_size(op_id))
+                for op_id, name in enumerate(task.operator_names)]
+    return [(op.name, op.get_encoding_size()) for op in task.operators]
+
+
+def _get_num_operators(task):
+    if isinstance(task, CompactSASTask):
+        return task.num_operators
+    return len(task.operators)
+
+
+def _remove_operators(task, op_names):
+    # Return a copy of a task or compact task without all operators whose
+    # name is in the set op_names.
+    if isinstance(task, CompactSASTask):
+        return task.without_operators(
+            op_id for op_id, name in enumerate(task.operator_names)
+            if name in op_names)
+    new_operators = [op for op in task.operators if op.name not in op_names]
+    removed_size = _get_encoding_size(
+        op for op in task.operators if op.name in op_names)
+    return SASTask(task.variables, task.mutexes, task.init, task.goal,
+                   new_operators, task.axioms, task.metric, sort=False,
+                   encoding_size=task.get_encoding_size() - removed_size)
+
+
+def _get_encoding_size(elements):
+    return sum(element.get_encoding_size() for element in elements)
+
+
+def _make_successor(state, child_task, msg):
+    # Copy everything except the task, which successor generators create
+    # without modifying the task of the parent state.
+    child_state = {key: copy.deepcopy(value) for key, value in state.items()
+                   if key != KEY_IN_STATE}
+    child_state[KEY_IN_STATE] = child_task
+    size_reduction = (state[KEY_IN_STATE].get_encoding_size() -
+                      child_task.get_encoding_size())
+    return Successor(child_state, msg, size_reduction)
+
+
+class PruneIrrelevant(SuccessorGenerator):
+    """
+    Generate a single successor where all parts of the task are removed that
+    cannot help reaching the goal: operators and axioms that are unreachable
+    when ignoring delete effects, as well as variables, operators, effects,
+    and axioms that are irrelevant for the goal (see
+    :func:`prune_irrelevant <machetli.sas.simplification.prune_irrelevant>`).
+    The analysis does not need an evaluator, so placing this generator first
+    removes large dead parts of a task with a single evaluation after every
+    step of the search. If nothing can be pruned, no successor is generated.
+    """
+    def get_description(self):
+        return ("Tries to remove all unreachable and irrelevant parts of the "
+                "task at once.")
+
+    @_supports_compact_tasks
+    def get_successors(self, state):
+        task = state[KEY_IN_STATE]
+        child_task = prune_irrelevant(task)
+        if child_task.get_encoding_size() < task.get_encoding_size():
+            yield _make_successor(
+                state, child_task,
+                f"Pruned unreachable and irrelevant parts of the task. "
+                f"Remaining operators: {len(child_task.operators)}, "
+                f"remaining variables: {len(child_task.variables.ranges)}")
 
 
 class RemoveOperators(SuccessorGenerator):
     """
     For each operator, generate a successor where this operator is
-    removed. The order of the successors is randomized.
+    removed. The order of the successors is randomized. With *order* set to
+    :attr:`ORDER_LARGEST_FIRST <machetli.successors.ORDER_LARGEST_FIRST>`,
+    operators with the largest encoding size are tried first. Compact tasks
+    are not expanded.
     """
+    def __init__(self, order=ORDER_RANDOM):
+        check_order(order)
+        self.order = order
+
     def get_description(self):
         return "Tries to remove individual operators."
 
     def get_successors(self, state):
         task = state[KEY_IN_STATE]
-        operator_names = [op.name for op in task.operators]
-        RNG.shuffle(operator_names)
+        operators = _get_operators(task)
+        operator_names = [name for name, _ in operators]
+        operator_sizes = defaultdict(int)
+        for name, size in operators:
+            operator_sizes[name] += size
+        order_candidates(operator_names, self.order, operator_sizes.get)
         for name in operator_names:
-            child_state = copy.deepcopy(state)
-            pre_child_task = child_state[KEY_IN_STATE]
-            child_state[KEY_IN_STATE] = self.transform(pre_child_task, name)
-            yield Successor(child_state,
-                            f"Removed operator '{name}'. Remaining operators: {len(operator_names) - 1}")
+            yield _make_successor(
+                state, self.transform(task, name),
+                f"Removed operator '{name}'. Remaining operators: {len(operator_names) - 1}")
 
     def transform(self, task, op_name):
-        new_operators = [op for op in task.operators if not op.name == op_name]
+        return _remove_operators(task, {op_name})
 
-        return SASTask(task.variables, task.mutexes, task.init, task.goal,
-                       new_operators, task.axioms, task.metric)
+
+class RemoveOperatorGroups(SuccessorGenerator):
+    """
+    Group the operators by a part of their name and generate successors
+    where a group of operators is removed at once. Operator names like
+    ``(move a b)`` list the schema name and the arguments of the action they
+    are grounded from. With *argument* set to 0 (the default), operators are
+    grouped by their schema name, so the first successors remove all
+    groundings of one action. With *argument* set to *i* > 0, they are
+    grouped by their *i*-th argument, e.g., to remove all operators
+    mentioning one object; operators with less than *i* arguments are not
+    considered.
+
+    First, each group is removed as a whole. Afterwards, each group falls
+    back to smaller chunks: halves, quarters, and so on down to individual
+    operators (see :func:`get_bisection_chunks
+    <machetli.successors.get_bisection_chunks>`). The order of the groups is
+    randomized. With *order* set to :attr:`ORDER_LARGEST_FIRST
+    <machetli.successors.ORDER_LARGEST_FIRST>`, groups with the largest
+    encoding size are tried first. Compact tasks are not expanded.
+    """
+    def __init__(self, argument=0, order=ORDER_RANDOM):
+        if argument < 0:
+            raise ValueError("The argument index must not be negative.")
+        self.argument = argument
+        check_order(order)
+        self.order = order
+
+    def get_description(self):
+        if self.argument == 0:
+            return "Tries to remove all operators of an action schema."
+        return (f"Tries to remove all operators with the same argument at "
+                f"position {self.argument}.")
+
+    def _get_groups(self, task):
+        # Map each key to the names of its operators. Operators can share a
+        # name, so we use dictionaries as ordered sets of names.
+        groups = defaultdict(dict)
+        group_sizes = defaultdict(int)
+        for name, size in _get_operators(task):
+            # Ignore all parentheses to also support names of the form
+            # "((move a b)_1)" created by some SAS+ generators.
+            parts = name.replace("(", " ").replace(")", " ").split()
+            if len(parts) > self.argument:
+                key = parts[self.argument]
+                groups[key][name] = None
+                group_sizes[key] += size
+        return {key: list(names) for key, names in groups.items()}, \
+            group_sizes
+
+    def get_successors(self, state):
+        task = state[KEY_IN_STATE]
+        groups, group_sizes = self._get_groups(task)
+        keys = list(groups)
+        order_candidates(keys, self.order, group_sizes.get)
+        for key in keys:
+            yield self._make_successor(state, key, groups[key])
+        for key in keys:
+            names = RNG.sample(groups[key], len(groups[key]))
+            chunks = get_bisection_chunks(names)
+            # The first chunk is the whole group, which was tried above.
+            next(chunks)
+            for chunk in chunks:
+                yield self._make_successor(state, key, chunk)
+
+    def _make_successor(self, state, key, names):
+        task = state[KEY_IN_STATE]
+        child_task = self.transform(task, names)
+        num_operators = _get_num_operators(task)
+        num_remaining = _get_num_operators(child_task)
+        return _make_successor(
+            state, child_task,
+            f"Removed {num_operators - num_remaining} "
+            f"operators of group '{key}'. Remaining operators: "
+            f"{num_remaining}")
+
+    def transform(self, task, op_names):
+        return _remove_operators(task, set(op_names))
 
 
 class RemoveVariables(SuccessorGenerator):
@@ -39,110 +272,283 @@ class RemoveVariables(SuccessorGenerator):
     For each variable, generate a successor where this variable is
     compiled away by removing it from the initial state as well as every
     place where it is mentioned in the prevail condition, effect
-    condition, effect fact, or goal. The order of the successors is
-    randomized.
+    condition, effect fact, or goal. Operators without remaining effects
+    and axioms for the variable are removed. To keep the indices of the
+    other variables contiguous, the last variable takes the index of the
+    removed variable, so only elements mentioning one of these two
+    variables change. This changes the order of the variables: if the
+    behavior you are looking for depends on the variable order of the
+    task, this generator may not find successors that keep it. The order
+    of the successors is randomized. With
+    *order* set to :attr:`ORDER_LARGEST_FIRST
+    <machetli.successors.ORDER_LARGEST_FIRST>`, variables mentioned by the
+    most task elements are tried first.
     """
+    def __init__(self, order=ORDER_RANDOM):
+        check_order(order)
+        self.order = order
+
     def get_description(self):
         return "Tries to project away individual variables."
 
+    @_supports_compact_tasks
     def get_successors(self, state):
         task = state[KEY_IN_STATE]
+        occurrences = VariableOccurrences(task)
         variables = [var for var in range(len(task.variables.axiom_layers))]
-        RNG.shuffle(variables)
+        order_candidates(variables, self.order,
+                         occurrences.get_num_occurrences)
         for var in variables:
-            child_state = copy.deepcopy(state)
-            pre_child_task = child_state[KEY_IN_STATE]
-            child_state[KEY_IN_STATE] = self.transform(pre_child_task, var)
-            yield Successor(child_state,
-                            f"Removed a variable. Remaining variables: {len(variables) - 1}")
-
-    def transform(self, task, var):
-        # remove var attributes from variables object
-        new_variables = task.variables
-        del new_variables.axiom_layers[var]
-        del new_variables.ranges[var]
-        del new_variables.value_names[var]
-        # remove var from from mutex groups
-        new_mutexes = []
-        for group in task.mutexes:
-            new_facts = []
-            for fact in group.facts:
-                if fact[0] == var:
-                    continue
-                if fact[0] > var:
-                    variable_index, value = fact
-                    variable_index = variable_index - 1  # decrement variable indices above var
-                    fact = (variable_index, value)
-                new_facts.append(fact)
-            new_mutexes.append(SASMutexGroup(new_facts))
-        # remove var from init
-        new_init = SASInit(task.init.values)
-        del new_init.values[var]
-        # remove var from goal pairs and decrement higher indices than var
-        new_goal_pairs = []
-        for pair in task.goal.pairs:
-            if pair[0] == var:
+            child_task = self.transform(task, var, occurrences)
+            yield _make_successor(
+                state, child_task,
+                f"Removed a variable. Remaining variables: {len(variables) - 1}")
+
+    def transform(self, task, var, occurrences=None):
+        """
+        Return a new task without variable *var*. Elements that do not
+        mention *var* or the last variable are shared with *task*.
+        """
+        if occurrences is None:
+            occurrences = VariableOccurrences(task)
+        last_var = len(task.variables.ranges) - 1
+
+        def rename(v):
+            return var if v == last_var else v
+
+        def rename_facts(facts):
+            return sorted((rename(v), value) for v, value in facts if v != var)
+
+        def move_last_and_remove(values):
+            values = list(values)
+            values[var] = values[last_var]
+            del values[last_var]
+            return values
+
+        def affected(index_lists):
+            return sorted(set(index_lists[var]) | set(index_lists[last_var]))
+
+        new_variables = SASVariables(
+            move_last_and_remove(task.variables.ranges),
+            move_last_and_remove(task.variables.axiom_layers),
+            move_last_and_remove(task.variables.value_names))
+        new_init = SASInit(move_last_and_remove(task.init.values))
+
+        # Track the encoding size by subtracting the size of all changed
+        # elements and adding the size of their replacements.
+        size = task.get_encoding_size() - (1 + task.variables.ranges[var])
+
+        new_mutexes = list(task.mutexes)
+        for mutex_id in affected(occurrences.mutexes):
+            new_mutexes[mutex_id] = SASMutexGroup(
+                rename_facts(task.mutexes[mutex_id].facts))
+            size += (new_mutexes[mutex_id].get_encoding_size() -
+                     task.mutexes[mutex_id].get_encoding_size())
+
+        if occurrences.goals[var] or occurrences.goals[last_var]:
+            new_goal = SASGoal(rename_facts(task.goal.pairs))
+            size += (new_goal.get_encoding_size() -
+                     task.goal.get_encoding_size())
+        else:
+            new_goal = task.goal
+
+        affected_operators = affected(occurrences.operators)
+        changed_operators = []
+        for op_id in affected_operators:
+            op = task.operators[op_id]
+            new_pre_post = [(rename(v), pre, post, rename_facts(cond))
+                            for v, pre, post, cond in op.pre_post if v != var]
+            if new_pre_post:
+                # Renaming is injective, so sorting keeps pre_post canonical
+                # unless facts of var were dropped from effect conditions.
+                # Then two effects can become identical and the operator
+                # has to remove the duplicates.
+                is_canonical = not any(
+                    cond_var == var for _, _, _, cond in op.pre_post
+                    for cond_var, _ in cond)
+                changed_operators.append(SASOperator(
+                    op.name, rename_facts(op.prevail), sorted(new_pre_post),
+                    op.cost, is_canonical=is_canonical))
+        new_operators = _insert_sorted(
+            _remove_indices(task.operators, affected_operators),
+            changed_operators, operator_sort_key)
+        size += (_get_encoding_size(changed_operators) - _get_encoding_size(
+            task.operators[op_id] for op_id in affected_operators))
+
+        affected_axioms = affected(occurrences.axioms)
+        changed_axioms = []
+        for axiom_id in affected_axioms:
+            axiom = task.axioms[axiom_id]
+            eff_var, eff_val = axiom.effect
+            if eff_var != var:
+                # axiom condition may also be empty
+                changed_axioms.append(SASAxiom(
+                    rename_facts(axiom.condition), (rename(eff_var), eff_val)))
+        new_axioms = _insert_sorted(
+            _remove_indices(task.axioms, affected_axioms),
+            changed_axioms, axiom_sort_key)
+        size += (_get_encoding_size(changed_axioms) - _get_encoding_size(
+            task.axioms[axiom_id] for axiom_id in affected_axioms))
+
+        return SASTask(new_variables, new_mutexes, new_init, new_goal,
+                       new_operators, new_axioms, task.metric, sort=False,
+                       encoding_size=size)
+
+
+class RemoveValues(SuccessorGenerator):
+    """
+    For each variable, generate successors where some of its values are
+    removed. Operators and axioms with a condition or effect on a removed
+    value are removed, as are conditional effects with such an effect
+    condition. The remaining values are renumbered consecutively. Values of
+    the initial state and the goal are never removed, derived variables are
+    not changed, and every variable keeps at least two values (use
+    :class:`RemoveVariables` to remove a variable completely).
+
+    The order of variables is randomized. With *order* set to
+    :attr:`ORDER_LARGEST_FIRST <machetli.successors.ORDER_LARGEST_FIRST>`,
+    variables with the most values are tried first. For each variable, the
+    generator first tries to remove all removable values at once and then
+    halves of them, quarters, and so on, until it tries removing individual
+    values. A variable with *n* values can thus often be reduced with a
+    logarithmic number of evaluations.
+    """
+    def __init__(self, order=ORDER_RANDOM):
+        check_order(order)
+        self.order = order
+
+    def get_description(self):
+        return "Tries to remove values from the domains of variables."
+
+    @_supports_compact_tasks
+    def get_successors(self, state):
+        task = state[KEY_IN_STATE]
+        occurrences = VariableOccurrences(task)
+        goal_values = defaultdict(set)
+        for var, value in task.goal.pairs:
+            goal_values[var].add(value)
+        variables = list(range(len(task.variables.ranges)))
+        order_candidates(variables, self.order,
+                         task.variables.ranges.__getitem__)
+        for var in variables:
+            if task.variables.axiom_layers[var] != -1:
                 continue
-            if pair[0] > var:
-                variable_index, value = pair
-                variable_index = variable_index - 1  # decrement variable indices above var
-                pair = (variable_index, value)
-            new_goal_pairs.append(pair)
-        new_goal = SASGoal(new_goal_pairs)
-        # remove var from operators
-        new_operators = []
-        for op in task.operators:
-            new_prevail = []
-            for pre in op.prevail:
-                if pre[0] == var:
+            num_values = task.variables.ranges[var]
+            removable = [value for value in range(num_values)
+                         if value != task.init.values[var] and
+                         value not in goal_values[var]]
+            for values in get_bisection_chunks(removable):
+                if num_values - len(values) < 2:
                     continue
-                if pre[0] > var:
-                    variable_index, value = pre
-                    variable_index = variable_index - 1  # decrement variable indices above var
-                    pre = (variable_index, value)
-                new_prevail.append(pre)
-            new_effects = []
-            for eff in op.pre_post:
-                v, pre, post, cond = eff
+                child_task = self.transform(task, var, values, occurrences)
+                yield _make_successor(
+                    state, child_task,
+                    f"Removed {len(values)} values of a variable. "
+                    f"Remaining values of the variable: "
+                    f"{num_values - len(values)}")
+
+    def transform(self, task, var, values, occurrences=None):
+        """
+        Return a new task in which the *values* of variable *var* are removed.
+        Elements that do not mention *var* are shared with *task*.
+        """
+        if occurrences is None:
+            occurrences = VariableOccurrences(task)
+        removed = set(values)
+        new_value = {}
+        for value in range(task.variables.ranges[var]):
+            if value not in removed:
+                new_value[value] = len(new_value)
+
+        def remap_facts(facts):
+            # Return None if a fact uses a removed value.
+            result = []
+            for v, value in facts:
                 if v == var:
-                    continue
-                if v > var:
-                    v = v - 1  # decrement variable indices above var
-                new_cond = []
-                for precondition in cond:
-                    if precondition[0] == var:
-                        continue
-                    if precondition[0] > var:
-                        variable_index, value = precondition
-                        variable_index = variable_index - 1  # decrement variable indices above var
-                        precondition = (variable_index, value)
-                    new_cond.append(precondition)
-                new_effects.append((v, pre, post, new_cond))
-            if not new_effects:
-                continue
-            new_operators.append(SASOperator(op.name, new_prevail, new_effects, op.cost))
-        # remove var from condition and effect of axioms
-        new_axioms = []
-        for ax in task.axioms:
-            if ax.effect[0] == var:
+                    if value in removed:
+                        return None
+                    value = new_value[value]
+                result.append((v, value))
+            return result
+
+        def replace_value(values, replacement):
+            values = list(values)
+            values[var] = replacement
+            return values
+
+        new_variables = SASVariables(
+            replace_value(task.variables.ranges, len(new_value)),
+            task.variables.axiom_layers,
+            replace_value(task.variables.value_names, [
+                name for value, name in enumerate(task.variables.value_names[var])
+                if value not in removed]))
+        new_init = SASInit(replace_value(
+            task.init.values, new_value[task.init.values[var]]))
+        # Track the encoding size by subtracting the size of all changed
+        # elements and adding the size of their replacements.
+        size = task.get_encoding_size() - len(removed)
+
+        new_mutexes = list(task.mutexes)
+        for mutex_id in occurrences.mutexes[var]:
+            facts = [(v, value) for v, value in task.mutexes[mutex_id].facts
+                     if v != var or value not in removed]
+            new_mutexes[mutex_id] = SASMutexGroup(remap_facts(facts))
+            size += (new_mutexes[mutex_id].get_encoding_size() -
+                     task.mutexes[mutex_id].get_encoding_size())
+
+        if occurrences.goals[var]:
+            # Goal values are never removed, so the goal size stays the same.
+            new_goal = SASGoal(remap_facts(task.goal.pairs))
+        else:
+            new_goal = task.goal
+
+        changed_operators = []
+        for op_id in occurrences.operators[var]:
+            op = task.operators[op_id]
+            new_prevail = remap_facts(op.prevail)
+            if new_prevail is None:
                 continue
-            if ax.effect[0] > var:
-                variable_index, value = ax.effect
-                variable_index = variable_index - 1  # decrement variable indices above var
-                ax.effect = (variable_index, value)
-            new_condition = []
-            for cond in ax.condition:
-                if cond[0] == var:
+            new_pre_post = []
+            for v, pre, post, cond in op.pre_post:
+                new_cond = remap_facts(cond)
+                if new_cond is None:
+                    # This conditional effect can never trigger.
                     continue
-                if cond[0] > var:
-                    variable_index, value = cond
-                    variable_index = variable_index - 1  # decrement variable indices above var
-                    cond = (variable_index, value)
-                new_condition.append(cond)
-            # axiom condition may also be empty
-            new_axioms.append(SASAxiom(new_condition, ax.effect))
+                if v == var:
+                    if pre in removed or post in removed:
+                        new_pre_post = None
+                        break
+                    if pre != -1:
+                        pre = new_value[pre]
+                    post = new_value[post]
+                new_pre_post.append((v, pre, post, new_cond))
+            if new_pre_post:
+                # Renumbering values keeps their order, so pre_post stays
+                # canonical.
+                changed_operators.append(SASOperator(
+                    op.name, new_prevail, new_pre_post, op.cost,
+                    is_canonical=True))
+        new_operators = _insert_sorted(
+            _remove_indices(task.operators, occurrences.operators[var]),
+            changed_operators, operator_sort_key)
+        size += (_get_encoding_size(changed_operators) - _get_encoding_size(
+            task.operators[op_id] for op_id in occurrences.operators[var]))
 
-        return SASTask(new_variables, new_mutexes, new_init, new_goal, new_operators, new_axioms, task.metric)
+        changed_axioms = []
+        for axiom_id in occurrences.axioms[var]:
+            axiom = task.axioms[axiom_id]
+            new_condition = remap_facts(axiom.condition)
+            if new_condition is not None:
+                changed_axioms.append(SASAxiom(new_condition, axiom.effect))
+        new_axioms = _insert_sorted(
+            _remove_indices(task.axioms, occurrences.axioms[var]),
+            changed_axioms, axiom_sort_key)
+        size += (_get_encoding_size(changed_axioms) - _get_encoding_size(
+            task.axioms[axiom_id] for axiom_id in occurrences.axioms[var]))
+
+        return SASTask(new_variables, new_mutexes, new_init, new_goal,
+                       new_operators, new_axioms, task.metric, sort=False,
+                       encoding_size=size)
 
 
 class RemovePrePosts(SuccessorGenerator):
@@ -157,15 +563,36 @@ class RemovePrePosts(SuccessorGenerator):
         return ("Tries to remove individual precondition/effect pairs in "
                 "operators. This ignores a variable in an operators.")
 
+    @_supports_compact_tasks
     def get_successors(self, state):
         task = state[KEY_IN_STATE]
         num_ops = len(task.operators)
         for op in RNG.sample(range(num_ops), num_ops):
             num_eff = len(task.operators[op].pre_post)
             for effect in RNG.sample(range(num_eff), num_eff):
-                child_state = copy.deepcopy(state)
-                del child_state[KEY_IN_STATE].operators[op].pre_post[effect]
-                yield Successor(child_state, f"Removed an effect of operator '{task.operators[op].name}'.")
+                child_task = self.transform(task, op, effect)
+                yield _make_successor(state, child_task,
+                                      f"Removed an effect of operator '{task.operators[op].name}'.")
+
+    def transform(self, task, op_id, effect_id):
+        """
+        Return a new task in which the *effect_id*-th entry of the pre_post
+        list of the *op_id*-th operator is removed. All other operators are
+        shared with *task*.
+        """
+        op = task.operators[op_id]
+        new_pre_post = list(op.pre_post)
+        del new_pre_post[effect_id]
+        new_op = SASOperator(op.name, op.prevail, new_pre_post, op.cost,
+                             is_canonical=True)
+        new_operators = _insert_sorted(
+            _remove_indices(task.operators, [op_id]), [new_op],
+            operator_sort_key)
+        size = (task.get_encoding_size() - op.get_encoding_size() +
+                new_op.get_encoding_size())
+        return SASTask(task.variables, task.mutexes, task.init, task.goal,
+                       new_operators, task.axioms, task.metric, sort=False,
+                       encoding_size=size)
 
 
 class SetUnspecifiedPreconditions(SuccessorGenerator):
@@ -178,13 +605,39 @@ class SetUnspecifiedPreconditions(SuccessorGenerator):
     are considered is randomized, as is the order of effects of the same
     operator, but all successors stemming from the same operator follow
     consecutively.
+
+    On tasks with many large variables, the number of such successors can be
+    huge. If *max_successors* is set, only this many candidates are
+    considered. They are the ones with the highest expected impact: values
+    that are achieved by the fewest operators come first because requiring
+    them restricts the applicability of the operator the most. The number of
+    skipped candidates is logged. Ranking the candidates still enumerates
+    all of them, so *max_successors* bounds the number of successors and
+    evaluations, not the time to generate the first successor.
     """
+    def __init__(self, max_successors=None):
+        if max_successors is not None and max_successors < 1:
+            raise ValueError("The maximal number of successors must be "
+                             "positive.")
+        self.max_successors = max_successors
+
     def get_description(self):
         return ("Tries to add preconditions to an operator, which have an "
                 "effect but no precondition on a variable.")
 
+    @_supports_compact_tasks
     def get_successors(self, state):
         task = state[KEY_IN_STATE]
+        candidates = self._get_candidates(task)
+        if self.max_successors is not None:
+            candidates = self._select_candidates(task, candidates)
+        for op, effect, val in candidates:
+            child_task = self.transform(task, op, effect, val)
+            yield _make_successor(
+                state, child_task,
+                f"Added a precondition to operator '{task.operators[op].name}'.")
+
+    def _get_candidates(self, task):
         num_ops = len(task.operators)
         for op in RNG.sample(range(num_ops), num_ops):
             num_eff = len(task.operators[op].pre_post)
@@ -193,12 +646,50 @@ class SetUnspecifiedPreconditions(SuccessorGenerator):
                 if pre == -1:
                     num_val = task.variables.ranges[var]
                     for val in RNG.sample(range(num_val), num_val):
-                        child_state = copy.deepcopy(state)
-                        child_state[KEY_IN_STATE].operators[op].pre_post[
-                            effect] = (var, val, post, cond)
-                        yield Successor(
-                            child_state,
-                            f"Removed a prevail condition of operator '{task.operators[op].name}'.")
+                        yield op, effect, val
+
+    def _select_candidates(self, task, candidates):
+        num_achievers = defaultdict(int)
+        for op in task.operators:
+            for var, _, post, _ in op.pre_post:
+                num_achievers[(var, post)] += 1
+        num_candidates = 0
+
+        def get_priority(candidate):
+            nonlocal num_candidates
+            num_candidates += 1
+            op, effect, val = candidate
+            var = task.operators[op].pre_post[effect][0]
+            # Ties are broken by the randomized order of the candidates.
+            return num_achievers[(var, val)], num_candidates
+
+        selected = heapq.nsmallest(self.max_successors, candidates,
+                                   key=get_priority)
+        num_skipped = num_candidates - len(selected)
+        if num_skipped:
+            logging.info(f"Skipping {num_skipped} of {num_candidates} "
+                         f"candidates for additional preconditions.")
+        return selected
+
+    def transform(self, task, op_id, effect_id, val):
+        """
+        Return a new task in which the *effect_id*-th entry of the pre_post
+        list of the *op_id*-th operator has the precondition *val*. All other
+        operators are shared with *task*.
+        """
+        op = task.operators[op_id]
+        new_pre_post = list(op.pre_post)
+        var, _, post, cond = new_pre_post[effect_id]
+        new_pre_post[effect_id] = (var, val, post, cond)
+        new_op = SASOperator(op.name, op.prevail, new_pre_post, op.cost)
+        new_operators = _insert_sorted(
+            _remove_indices(task.operators, [op_id]), [new_op],
+            operator_sort_key)
+        size = (task.get_encoding_size() - op.get_encoding_size() +
+                new_op.get_encoding_size())
+        return SASTask(task.variables, task.mutexes, task.init, task.goal,
+                       new_operators, task.axioms, task.metric, sort=False,
+                       encoding_size=size)
 
 
 class MergeOperators(SuccessorGenerator):
@@ -206,43 +697,89 @@ class MergeOperators(SuccessorGenerator):
     For each pair of operators, generate a successor where these two
     operators are merged into one. Specifically, these operators
     are removed and instead a new operator is added that is equivalent to
-    executing the two operators in sequence. Cases where this is not
-    possible (e.g., with conflicting prevail conditions) are skipped.
+    executing the two operators in sequence. Pairs where this is not
+    possible (e.g., with conflicting prevail conditions) are detected with an
+    index over the preconditions of all operators and are skipped without
+    creating a successor. Operators with conditional effects are not merged.
+
+    Merged operators get short names of the form ``(merged-operator-N)``.
+    The state maps each such name to the names of the two operators it was
+    merged from, and :meth:`write_file <machetli.sas.write_file>` writes the
+    complete merge history of all merged operators next to the task.
+
+    Successors are ordered by the first operator of the pair. If
+    *prioritize_overlap* is ``True``, pairs with the same first operator are
+    ordered by how many variables the effects of the first operator share
+    with the preconditions of the second, so merges of operators that are
+    chained more tightly come first. Otherwise, they are ordered like the
+    operators of the task.
     """
+    def __init__(self, prioritize_overlap=False):
+        self.prioritize_overlap = prioritize_overlap
+
     def get_description(self):
         return ("Tries to replace a pair of operators with a single operator "
                 "equivalent to applying both in sequence.")
 
+    @_supports_compact_tasks
     def get_successors(self, state):
         task = state[KEY_IN_STATE]
-        for op1, op2 in itertools.permutations(task.operators, 2):
-            child_state = copy.deepcopy(state)
-            child_task = self.transform(child_state[KEY_IN_STATE], op1, op2)
-            if child_task:
-                child_state[KEY_IN_STATE] = child_task
-                yield Successor(child_state,
-                                f"Merged operators '{op1.name}' and '{op2.name}'. " +
-                                f"Remaining operators: {len(task.operators) - 1}")
-
-    def transform(self, task, op1, op2):
-        def combined_pre_post(op):
-            combined_pre, combined_post = {}, {}
-            for var, value in op.prevail:
-                combined_pre[var] = value
-                combined_post[var] = value
-            for var, pre, post, cond in op.pre_post:
-                if cond:
-                    raise NotImplementedError("Conditional effects not yet supported.")
-                if pre != -1:
-                    combined_pre[var] = pre
-                combined_post[var] = post
-            return combined_pre, combined_post
-
-        pre1, post1 = combined_pre_post(op1)
-        pre2, post2 = combined_pre_post(op2)
+        combined = [_get_combined_pre_post(op) for op in task.operators]
+        mergeable = {op_id for op_id, pre_post in enumerate(combined)
+                     if pre_post is not None}
+        # Operators with a precondition on each variable.
+        ops_with_pre_on_var = defaultdict(list)
+        for op_id in mergeable:
+            for var in combined[op_id][0]:
+                ops_with_pre_on_var[var].append(op_id)
+        for op1_id in sorted(mergeable):
+            _, post1 = combined[op1_id]
+            # The second operator must not require a different value for a
+            # variable than the one the first operator leaves behind.
+            compatible = set(mergeable)
+            compatible.discard(op1_id)
+            for var, post in post1.items():
+                compatible.difference_update(
+                    op2_id for op2_id in ops_with_pre_on_var[var]
+                    if combined[op2_id][0][var] != post)
+            if self.prioritize_overlap:
+                def get_priority(op2_id):
+                    overlap = len(post1.keys() & combined[op2_id][0].keys())
+                    return -overlap, op2_id
+                second_op_ids = sorted(compatible, key=get_priority)
+            else:
+                second_op_ids = sorted(compatible)
+            op1 = task.operators[op1_id]
+            for op2_id in second_op_ids:
+                op2 = task.operators[op2_id]
+                merged_operators = dict(state.get(KEY_MERGED_OPERATORS, {}))
+                merged_name = f"(merged-operator-{len(merged_operators) + 1})"
+                merged_operators[merged_name] = (op1.name, op2.name)
+                child_task = self.transform(task, op1, op2, merged_name)
+                successor = _make_successor(
+                    state, child_task,
+                    f"Merged operators '{op1.name}' and '{op2.name}' into "
+                    f"'{merged_name}'. Remaining operators: "
+                    f"{len(task.operators) - 1}")
+                successor.state[KEY_MERGED_OPERATORS] = merged_operators
+                yield successor
+
+    def transform(self, task, op1, op2, merged_name=None):
+        """
+        Return a new task in which *op1* and *op2* are replaced by an
+        operator named *merged_name* that applies both in sequence, or
+        ``None`` if *op2* is not applicable after *op1*. Without
+        *merged_name*, the names of both operators are concatenated.
+        """
+        combined1 = _get_combined_pre_post(op1)
+        combined2 = _get_combined_pre_post(op2)
+        if combined1 is None or combined2 is None:
+            raise NotImplementedError("Conditional effects not yet supported.")
+        pre1, post1 = combined1
+        pre2, post2 = combined2
 
         # Check that op2 is applicable and update preconditions
-        merged_pre = pre1
+        merged_pre = dict(pre1)
         for var, pre in pre2.items():
             if var not in post1:
                 merged_pre[var] = pre
@@ -251,7 +788,7 @@ class MergeOperators(SuccessorGenerator):
                 return None
 
         # update effects
-        merged_post = post1
+        merged_post = dict(post1)
         merged_post.update(post2)
 
         merged_prevail = []
@@ -263,28 +800,151 @@ class MergeOperators(SuccessorGenerator):
             else:
                 merged_pre_post.append((var, pre, post, []))
 
-        merged_name = op1.name + " and then " + op2.name
+        if merged_name is None:
+            merged_name = op1.name + " and then " + op2.name
         merged_cost = op1.cost + op2.cost
         merged_op = SASOperator(merged_name, merged_prevail, merged_pre_post, merged_cost)
 
-        new_operators = [op for op in task.operators if op.name not in [op1.name, op2.name]] + [merged_op]
+        new_operators = _insert_sorted(
+            [op for op in task.operators if op is not op1 and op is not op2],
+            [merged_op], operator_sort_key)
 
+        size = (task.get_encoding_size() - op1.get_encoding_size() -
+                op2.get_encoding_size() + merged_op.get_encoding_size())
         return SASTask(task.variables, task.mutexes, task.init, task.goal, new_operators,
-                       task.axioms, task.metric)
+                       task.axioms, task.metric, sort=False, encoding_size=size)
 
 
 class RemoveGoals(SuccessorGenerator):
     """
     For each goal condition, generate a successor where this goal condition
-    is removed. The order of the successors is randomized
+    is removed. The order of the successors is randomized. Compact tasks are
+    not expanded.
     """
     def get_description(self):
         return "Tries to remove goal conditions."
 
     def get_successors(self, state):
         task = state[KEY_IN_STATE]
-        num_goals = len(task.goal.pairs)
+        if isinstance(task, CompactSASTask):
+            num_goals = len(task.goal_facts) // 2
+        else:
+            num_goals = len(task.goal.pairs)
         for goal_id in RNG.sample(range(num_goals), num_goals):
-            child_state = copy.deepcopy(state)
-            del child_state[KEY_IN_STATE].goal.pairs[goal_id]
-            yield Successor(child_state, f"Removed a goal. Remaining goals: {num_goals - 1}")
\ No newline at end of file
+            yield _make_successor(
+                state, self.transform(task, goal_id),
+                f"Removed a goal. Remaining goals: {num_goals - 1}")
+
+    def transform(self, task, goal_id):
+        if isinstance(task, CompactSASTask):
+            return task.without_goals([goal_id])
+        new_pairs = list(task.goal.pairs)
+        del new_pairs[goal_id]
+        return SASTask(task.variables, task.mutexes, task.init,
+                       SASGoal(new_pairs), task.operators, task.axioms,
+                       task.metric, sort=False,
+                       encoding_size=task.get_encoding_size() - 1)
+
+
+class RemoveMutexGroups(SuccessorGenerator):
+    """
+    Generate successors where mutex groups are removed. The first successor
+    removes all mutex groups at once, the following ones remove halves of
+    them, then quarters, and so on until individual mutex groups are
+    removed. The order of the mutex groups is randomized.
+    """
+    def get_description(self):
+        return "Tries to remove mutex groups, starting with all of them."
+
+    @_supports_compact_tasks
+    def get_successors(self, state):
+        task = state[KEY_IN_STATE]
+        num_mutexes = len(task.mutexes)
+        mutex_ids = RNG.sample(range(num_mutexes), num_mutexes)
+        for chunk in get_bisection_chunks(mutex_ids):
+            child_task = self.transform(task, chunk)
+            yield _make_successor(
+                state, child_task,
+                f"Removed {len(chunk)} mutex groups. Remaining mutex groups: "
+                f"{num_mutexes - len(chunk)}")
+
+    def transform(self, task, mutex_ids):
+        new_mutexes = _remove_indices(task.mutexes, sorted(mutex_ids))
+        size = task.get_encoding_size() - _get_encoding_size(
+            task.mutexes[mutex_id] for mutex_id in mutex_ids)
+        return SASTask(task.variables, new_mutexes, task.init, task.goal,
+                       task.operators, task.axioms, task.metric, sort=False,
+                       encoding_size=size)
+
+
+class RemoveAxioms(SuccessorGenerator):
+    """
+    Generate successors where axioms are removed. The first successor
+    removes all axioms at once, the following ones remove halves of them,
+    then quarters, and so on until individual axioms are removed. The order
+    of the axioms is randomized.
+    """
+    def get_description(self):
+        return "Tries to remove axioms, starting with all of them."
+
+    @_supports_compact_tasks
+    def get_successors(self, state):
+        task = state[KEY_IN_STATE]
+        num_axioms = len(task.axioms)
+        axiom_ids = RNG.sample(range(num_axioms), num_axioms)
+        for chunk in get_bisection_chunks(axiom_ids):
+            child_task = self.transform(task, chunk)
+            yield _make_successor(
+                state, child_task,
+                f"Removed {len(chunk)} axioms. Remaining axioms: "
+                f"{num_axioms - len(chunk)}")
+
+    def transform(self, task, axiom_ids):
+        new_axioms = _remove_indices(task.axioms, sorted(axiom_ids))
+        size = task.get_encoding_size() - _get_encoding_size(
+            task.axioms[axiom_id] for axiom_id in axiom_ids)
+        return SASTask(task.variables, task.mutexes, task.init, task.goal,
+                       task.operators, new_axioms, task.metric, sort=False,
+                       encoding_size=size)
+
+
+class RestrictToPlan(SuccessorGenerator):
+    """
+    Generate a single successor that only keeps the operators that occur in
+    the plan the evaluator found for the current state. The evaluator has to
+    write this plan to the file *plan_filename* in its working directory (Fast
+    Downward does this by default). If the file does not exist, e.g., for the
+    initial state, or if all operators occur in the plan, no successor is
+    generated.
+    """
+    def __init__(self, plan_filename="sas_plan"):
+        self.plan_filename = plan_filename
+
+    def get_description(self):
+        return ("Tries to remove all operators that are not used in the plan "
+                "found by the evaluator.")
+
+    @_supports_compact_tasks
+    def get_successors(self, state):
+        plan_path = get_run_dir_path(state, self.plan_filename)
+        if plan_path is None:
+            return
+        used_names = set(read_plan(plan_path))
+        task = state[KEY_IN_STATE]
+        child_task = self.transform(task, used_names)
+        if len(child_task.operators) == len(task.operators):
+            return
+        yield _make_successor(
+            state, child_task,
+            f"Removed all operators not used in the plan. "
+            f"Remaining operators: {len(child_task.operators)}")
+
+    def transform(self, task, used_names):
+        new_operators = [op for op in task.operators
+                         if " ".join(op.name[1:-1].split()) in used_names]
+        size = (task.get_encoding_size() -
+                _get_encoding_size(task.operators) +
+                _get_encoding_size(new_operators))
+        return SASTask(task.variables, task.mutexes, task.init, task.goal,
+                       new_operators, task.axioms, task.metric, sort=False,
+                       encoding_size=size)
@@ -0,0 +1,50 @@
+r"""
+Indices into the elements of a SAS\ :sup:`+` task that let successor
+generators find the parts of a task affected by a transformation without
+scanning the whole task.
+"""
+
+
+class VariableOccurrences:
+    """
+    Index from each variable of *task* to the elements of the task that
+    mention it. For each variable ``var``, ``operators[var]``,
+    ``axioms[var]``, and ``mutexes[var]`` are sorted lists of indices into
+    the corresponding lists of the task, and ``goals[var]`` is ``True`` if
+    the goal mentions ``var``. An operator mentions a variable if it occurs
+    in its prevail conditions, effects, or effect conditions; an axiom
+    mentions a variable if it occurs in its condition or effect.
+
+    The index refers to the task it was built from and has to be rebuilt
+    after the task changes.
+    """
+    def __init__(self, task):
+        num_vars = len(task.variables.ranges)
+        self.operators = [[] for _ in range(num_vars)]
+        self.axioms = [[] for _ in range(num_vars)]
+        self.mutexes = [[] for _ in range(num_vars)]
+        self.goals = [False] * num_vars
+        for op_id, op in enumerate(task.operators):
+            variables = {var for var, _ in op.prevail}
+            for var, _, _, cond in op.pre_post:
+                variables.add(var)
+                variables.update(cond_var for cond_var, _ in cond)
+            for var in variables:
+                self.operators[var].append(op_id)
+        for axiom_id, axiom in enumerate(task.axioms):
+            variables = {var for var, _ in axiom.condition}
+            variables.add(axiom.effect[0])
+            for var in variables:
+                self.axioms[var].append(axiom_id)
+        for mutex_id, mutex in enumerate(task.mutexes):
+            for var in {var for var, _ in mutex.facts}:
+                self.mutexes[var].append(mutex_id)
+        for var, _ in task.goal.pairs:
+            self.goals[var] = True
+
+    def get_num_occurrences(self, var):
+        """
+        Return the number of task elements mentioning *var*.
+        """
+        return (len(self.operators[var]) + len(self.axioms[var]) +
+                len(self.mutexes[var]) + int(self.goals[var]))
@@ -5,25 +5,46 @@ SAS_FILE_VERSION = 3
 DEBUG = False
 
 
+def operator_sort_key(op):
+    """Key by which SASTask sorts its operators."""
+    return op.name, op.prevail, op.pre_post
+
+
+def axiom_sort_key(axiom):
+    """Key by which SASTask sorts its axioms."""
+    return axiom.condition, axiom.effect
+
+
 class SASTask:
     """Planning task in finite-domain representation.
 
     The user is responsible for making sure that the data fits a
     number of structural restrictions. For example, conditions should
     generally be sorted and mention each variable at most once. See
-    the validate methods for details."""
+    the validate methods for details.
+
+    Operators and axioms are sorted on construction. Pass sort=False
+    if they are already sorted by operator_sort_key and axiom_sort_key,
+    e.g., because they were filtered or merged from a sorted task.
+
+    The encoding size is computed on demand and cached, so tasks must not
+    be modified in place once it was computed. Code that derives a task
+    from another one can pass the known size as encoding_size."""
 
     def __init__(self, variables, mutexes, init, goal,
-                 operators, axioms, metric):
+                 operators, axioms, metric, sort=True, encoding_size=None):
         self.variables = variables
         self.mutexes = mutexes
         self.init = init
         self.goal = goal
-        self.operators = sorted(operators, key=lambda op: (
-            op.name, op.prevail, op.pre_post))
-        self.axioms = sorted(axioms, key=lambda axiom: (
-            axiom.condition, axiom.effect))
+        if sort:
+            self.operators = sorted(operators, key=operator_sort_key)
+            self.axioms = sorted(axioms, key=axiom_sort_key)
+        else:
+            self.operators = list(operators)
+            self.axioms = list(axioms)
         self.metric = metric
+        self._encoding_size = encoding_size
         if DEBUG:
             self.validate()
 
@@ -98,16 +119,18 @@ class SASTask:
             axiom.output(stream)
 
     def get_encoding_size(self):
-        task_size = 0
-        task_size += self.variables.get_encoding_size()
-        for mutex in self.mutexes:
-            task_size += mutex.get_encoding_size()
-        task_size += self.goal.get_encoding_size()
-        for op in self.operators:
-            task_size += op.get_encoding_size()
-        for axiom in self.axioms:
-            task_size += axiom.get_encoding_size()
-        return task_size
+        if self._encoding_size is None:
+            task_size = 0
+            task_size += self.variables.get_encoding_size()
+            for mutex in self.mutexes:
+                task_size += mutex.get_encoding_size()
+            task_size += self.goal.get_encoding_size()
+            for op in self.operators:
+                task_size += op.get_encoding_size()
+            for axiom in self.axioms:
+                task_size += axiom.get_encoding_size()
+            self._encoding_size = task_size
+        return self._encoding_size
 
 
 class SASVariables:
@@ -253,10 +276,16 @@ class SASGoal:
 
 
 class SASOperator:
-    def __init__(self, name, prevail, pre_post, cost):
+    def __init__(self, name, prevail, pre_post, cost, is_canonical=False):
+        # With is_canonical=True, prevail and pre_post must already be
+        # sorted and pre_post must not contain duplicates.
         self.name = name
-        self.prevail = sorted(prevail)
-        self.pre_post = self._canonical_pre_post(pre_post)
+        if is_canonical:
+            self.prevail = prevail
+            self.pre_post = pre_post
+        else:
+            self.prevail = sorted(prevail)
+            self.pre_post = self._canonical_pre_post(pre_post)
         self.cost = cost
 
     def _canonical_pre_post(self, pre_post):
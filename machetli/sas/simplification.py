@@ -0,0 +1,176 @@
+r"""
+Evaluator-free simplifications of SAS\ :sup:`+` tasks. These analyses only
+remove parts of a task that cannot influence whether the goal can be reached:
+operators and axioms that are unreachable in the delete relaxation of the
+task, and variables, operators, effects, and axioms that cannot contribute to
+reaching the goal.
+"""
+from collections import defaultdict
+
+from machetli.sas.sas_tasks import SASTask, SASVariables, SASMutexGroup, \
+    SASInit, SASGoal, SASOperator, SASAxiom
+
+
+def compute_relaxed_reachability(task):
+    """
+    Compute which facts, operators, and axioms of *task* are reachable when
+    ignoring delete effects. All facts of the initial state are reachable,
+    which includes the default values of derived variables.
+
+    :return: a triple of the set of reachable (var, value) facts, the set of
+        indices of reachable operators, and the set of indices of reachable
+        axioms.
+    """
+    # A unit is a set of conditions together with the facts it reaches once
+    # all conditions are reached. There is one unit per operator and axiom,
+    # and additional units for conditional effects.
+    unit_conditions = []
+    unit_effects = []
+    operator_units = {}
+    axiom_units = {}
+    for op_id, op in enumerate(task.operators):
+        conditions = op.get_applicability_conditions()
+        operator_units[len(unit_conditions)] = op_id
+        unit_conditions.append(conditions)
+        unit_effects.append([(var, post) for var, _, post, cond in op.pre_post
+                             if not cond])
+        for var, _, post, cond in op.pre_post:
+            if cond:
+                unit_conditions.append(conditions + cond)
+                unit_effects.append([(var, post)])
+    for axiom_id, axiom in enumerate(task.axioms):
+        axiom_units[len(unit_conditions)] = axiom_id
+        unit_conditions.append(axiom.condition)
+        unit_effects.append([axiom.effect])
+
+    num_unreached_conditions = []
+    units_waiting_for = defaultdict(list)
+    for unit_id, conditions in enumerate(unit_conditions):
+        conditions = set(conditions)
+        num_unreached_conditions.append(len(conditions))
+        for fact in conditions:
+            units_waiting_for[fact].append(unit_id)
+
+    reached = set()
+    queue = []
+
+    def reach(facts):
+        for fact in facts:
+            if fact not in reached:
+                reached.add(fact)
+                queue.append(fact)
+
+    reach(enumerate(task.init.values))
+    fired_units = set()
+    for unit_id, num_unreached in enumerate(num_unreached_conditions):
+        if num_unreached == 0:
+            fired_units.add(unit_id)
+            reach(unit_effects[unit_id])
+    while queue:
+        fact = queue.pop()
+        for unit_id in units_waiting_for[fact]:
+            num_unreached_conditions[unit_id] -= 1
+            if num_unreached_conditions[unit_id] == 0:
+                fired_units.add(unit_id)
+                reach(unit_effects[unit_id])
+
+    reachable_operators = {op_id for unit_id, op_id in operator_units.items()
+                           if unit_id in fired_units}
+    reachable_axioms = {axiom_id for unit_id, axiom_id in axiom_units.items()
+                        if unit_id in fired_units}
+    return reached, reachable_operators, reachable_axioms
+
+
+def compute_relevant_variables(task, operator_ids, axiom_ids):
+    """
+    Compute the variables of *task* that can influence reaching the goal if
+    only the operators and axioms with indices in *operator_ids* and
+    *axiom_ids* are used. Goal variables are relevant, and so are all
+    variables in the conditions of operators and axioms that affect a relevant
+    variable.
+
+    :return: the set of relevant variables.
+    """
+    relevant = set()
+    queue = []
+
+    def mark_relevant(variables):
+        for var in variables:
+            if var not in relevant:
+                relevant.add(var)
+                queue.append(var)
+
+    # Collect the conditions of operators and axioms by affected variable.
+    conditions_by_effect_var = defaultdict(list)
+    for op_id in operator_ids:
+        op = task.operators[op_id]
+        condition_vars = {var for var, _ in op.prevail}
+        for var, pre, _, cond in op.pre_post:
+            if pre != -1:
+                condition_vars.add(var)
+            condition_vars.update(cond_var for cond_var, _ in cond)
+        for var, _, _, _ in op.pre_post:
+            conditions_by_effect_var[var].append(condition_vars)
+    for axiom_id in axiom_ids:
+        axiom = task.axioms[axiom_id]
+        conditions_by_effect_var[axiom.effect[0]].append(
+            {var for var, _ in axiom.condition})
+
+    mark_relevant(var for var, _ in task.goal.pairs)
+    while queue:
+        var = queue.pop()
+        for condition_vars in conditions_by_effect_var.pop(var, []):
+            mark_relevant(condition_vars)
+    return relevant
+
+
+def prune_irrelevant(task):
+    """
+    Return a copy of *task* without operators and axioms that are
+    unreachable in the delete relaxation or do not affect any relevant
+    variable (see :func:`compute_relevant_variables`), without effects on
+    irrelevant variables, and without irrelevant variables. Mutex groups
+    that only mention irrelevant variables are removed as well.
+    """
+    _, reachable_operators, reachable_axioms = \
+        compute_relaxed_reachability(task)
+    relevant_vars = compute_relevant_variables(
+        task, reachable_operators, reachable_axioms)
+    kept_vars = sorted(relevant_vars)
+    new_index = {var: index for index, var in enumerate(kept_vars)}
+
+    def project_facts(facts):
+        return [(new_index[var], value) for var, value in facts
+                if var in new_index]
+
+    variables = SASVariables(
+        [task.variables.ranges[var] for var in kept_vars],
+        [task.variables.axiom_layers[var] for var in kept_vars],
+        [task.variables.value_names[var] for var in kept_vars])
+    mutexes = []
+    for mutex in task.mutexes:
+        facts = project_facts(mutex.facts)
+        if facts:
+            mutexes.append(SASMutexGroup(facts))
+    init = SASInit([task.init.values[var] for var in kept_vars])
+    goal = SASGoal(project_facts(task.goal.pairs))
+    operators = []
+    for op_id in sorted(reachable_operators):
+        op = task.operators[op_id]
+        # Conditions of operators with relevant effects only mention
+        # relevant variables.
+        pre_post = [(new_index[var], pre, post, project_facts(cond))
+                    for var, pre, post, cond in op.pre_post
+                    if var in new_index]
+        if pre_post:
+            operators.append(SASOperator(
+                op.name, project_facts(op.prevail), pre_post, op.cost))
+    axioms = []
+    for axiom_id in sorted(reachable_axioms):
+        axiom = task.axioms[axiom_id]
+        var, value = axiom.effect
+        if var in new_index:
+            axioms.append(SASAxiom(project_facts(axiom.condition),
+                                   (new_index[var], value)))
+    return SASTask(variables, mutexes, init, goal, operators, axioms,
+                   task.metric)
@@ -0,0 +1,575 @@
+r"""
+Validation of :class:`CompactSASTask
+<machetli.sas.compact_tasks.CompactSASTask>` objects directly on their
+integer arrays. The checks are the ones of :meth:`SASTask.validate
+<machetli.sas.sas_tasks.SASTask.validate>`, but each of them runs over all
+facts of a kind at once instead of over Python objects for each operator and
+axiom. If `NumPy <https://numpy.org>`_ is installed (e.g., with ``pip install
+machetli[numpy]``), the checks are vectorized; otherwise, an equivalent
+pure-Python implementation is used.
+
+Both implementations run the checks in the same order and report the first
+violation with an :class:`AssertionError` whose message names the offending
+variable, mutex group, operator, effect, or axiom.
+"""
+from bisect import bisect_right
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def validate_compact_task(task, use_numpy=None):
+    """
+    Fail an assertion if the :class:`CompactSASTask
+    <machetli.sas.compact_tasks.CompactSASTask>` *task* is invalid.
+
+    :param use_numpy: if ``None``, use the vectorized checks if NumPy is
+        installed. Use ``False`` to force the pure-Python checks.
+    """
+    if use_numpy is None:
+        use_numpy = numpy is not None
+    if use_numpy:
+        if numpy is None:
+            raise ImportError("Vectorized validation requires NumPy.")
+        _NumpyChecks(task).validate()
+    else:
+        _PythonChecks(task).validate()
+
+
+def _fail(message):
+    raise AssertionError(message)
+
+
+def _get_group(offsets, index):
+    # Return the group (mutex group, operator, effect, or axiom) whose
+    # facts or effects contain the entry at position index.
+    return bisect_right(offsets, index) - 1
+
+
+class _Checks:
+    """
+    Shared driver of the checks. Subclasses implement the find_* methods,
+    each of which returns the index of the first violating entry or None.
+    Facts are (var, value) entries of flat fact arrays and effects are
+    (var, pre, post) entries of the effects array.
+    """
+    def __init__(self, task):
+        self.task = task
+
+    def _operator(self, op_id):
+        return "operator %d %s" % (op_id, self.task.operator_names[op_id])
+
+    def _effect(self, eff_id):
+        op_id = _get_group(self.task.effect_offsets, eff_id)
+        return "effect %d of %s" % (
+            eff_id - self.task.effect_offsets[op_id], self._operator(op_id))
+
+    def _get_condition(self, eff_id):
+        # Effects are sorted like the (var, pre, post, cond) tuples of
+        # SASOperator.pre_post, so ties are broken by the condition.
+        task = self.task
+        facts = task.effect_condition_facts
+        return [(facts[2 * i], facts[2 * i + 1])
+                for i in range(task.effect_condition_offsets[eff_id],
+                               task.effect_condition_offsets[eff_id + 1])]
+
+    def _fact(self, facts, index):
+        return "(%d, %d)" % (facts[2 * index], facts[2 * index + 1])
+
+    def validate(self):
+        task = self.task
+        self.validate_variables()
+
+        facts = task.mutex_facts
+        index = self.find_invalid_fact(facts)
+        if index is not None:
+            _fail("Mutex group %d contains invalid fact %s." % (
+                _get_group(task.mutex_offsets, index),
+                self._fact(facts, index)))
+        index = self.find_unsorted_fact(facts, task.mutex_offsets,
+                                        by_value=True)
+        if index is not None:
+            _fail("Mutex group %d is not sorted or repeats fact %s." % (
+                _get_group(task.mutex_offsets, index),
+                self._fact(facts, index)))
+
+        if len(task.init) != task.num_variables:
+            _fail("Initial state has %d values for %d variables." % (
+                len(task.init), task.num_variables))
+        var = self.find_invalid_init_value()
+        if var is not None:
+            _fail("Initial state assigns invalid value %d to variable %d." % (
+                task.init[var], var))
+
+        facts = task.goal_facts
+        if not facts:
+            _fail("Goal is empty.")
+        index = self.find_invalid_fact(facts)
+        if index is not None:
+            _fail("Goal contains invalid fact %s." % self._fact(facts, index))
+        index = self.find_unsorted_fact(facts, [0, len(facts) // 2])
+        if index is not None:
+            _fail("Goal is not sorted by variable or mentions variable %d "
+                  "twice." % facts[2 * index])
+
+        self.validate_operators()
+        self.validate_axioms()
+        if task.metric is not False and task.metric is not True:
+            _fail("Metric %r is not a Boolean." % (task.metric,))
+
+    def validate_variables(self):
+        task = self.task
+        if not (len(task.ranges) == len(task.axiom_layers) ==
+                len(task.value_names)):
+            _fail("Task has %d ranges, %d axiom layers, and %d lists of "
+                  "value names." % (len(task.ranges), len(task.axiom_layers),
+                                    len(task.value_names)))
+        for var, (var_range, names) in enumerate(
+                zip(task.ranges, task.value_names)):
+            if var_range != len(names):
+                _fail("Variable %d has range %d but %d value names." % (
+                    var, var_range, len(names)))
+        var = self.find_small_range()
+        if var is not None:
+            _fail("Variable %d has range %d." % (var, task.ranges[var]))
+        var = self.find_invalid_layer()
+        if var is not None:
+            _fail("Variable %d has invalid axiom layer %d." % (
+                var, task.axiom_layers[var]))
+        var = self.find_non_binary_derived_variable()
+        if var is not None:
+            _fail("Derived variable %d has range %d." % (
+                var, task.ranges[var]))
+
+    def validate_operators(self):
+        task = self.task
+        facts = task.prevail_facts
+        index = self.find_invalid_fact(facts)
+        if index is not None:
+            _fail("Prevail condition of %s contains invalid fact %s." % (
+                self._operator(_get_group(task.prevail_offsets, index)),
+                self._fact(facts, index)))
+        index = self.find_unsorted_fact(facts, task.prevail_offsets)
+        if index is not None:
+            _fail("Prevail condition of %s is not sorted by variable or "
+                  "mentions variable %d twice." % (
+                      self._operator(_get_group(task.prevail_offsets, index)),
+                      facts[2 * index]))
+        eff_id = self.find_non_canonical_effect()
+        if eff_id is not None:
+            _fail("The effects of %s are not sorted or contain duplicates "
+                  "(first violation at effect %d)." % (
+                      self._operator(_get_group(task.effect_offsets, eff_id)),
+                      eff_id - task.effect_offsets[
+                          _get_group(task.effect_offsets, eff_id)]))
+
+        facts = task.effect_condition_facts
+        index = self.find_invalid_fact(facts)
+        if index is not None:
+            _fail("Condition of %s contains invalid fact %s." % (
+                self._effect(_get_group(task.effect_condition_offsets,
+                                        index)),
+                self._fact(facts, index)))
+        index = self.find_unsorted_fact(facts, task.effect_condition_offsets)
+        if index is not None:
+            _fail("Condition of %s is not sorted by variable or mentions "
+                  "variable %d twice." % (
+                      self._effect(_get_group(task.effect_condition_offsets,
+                                              index)),
+                      facts[2 * index]))
+        eff_id = self.find_effect_on_prevail_variable()
+        if eff_id is not None:
+            _fail("Variable of %s has a prevail condition." %
+                  self._effect(eff_id))
+        eff_id = self.find_invalid_effect()
+        if eff_id is not None:
+            _fail("Invalid (var, pre, post) triple %s in %s." % (
+                tuple(task.effects[3 * eff_id:3 * eff_id + 3]),
+                self._effect(eff_id)))
+        eff_id = self.find_derived_effect()
+        if eff_id is not None:
+            _fail("Derived variable %d is changed by %s." % (
+                task.effects[3 * eff_id], self._effect(eff_id)))
+        eff_id = self.find_inconsistent_precondition()
+        if eff_id is not None:
+            _fail("Inconsistent preconditions on variable %d in %s." % (
+                task.effects[3 * eff_id], self._effect(eff_id)))
+        index = self.find_condition_on_precondition_variable()
+        if index is not None:
+            _fail("Condition of %s mentions variable %d, which has a "
+                  "precondition or prevail condition." % (
+                      self._effect(_get_group(task.effect_condition_offsets,
+                                              index)),
+                      facts[2 * index]))
+        op_id = self.find_operator_without_effects()
+        if op_id is not None:
+            _fail("No effects in %s." % self._operator(op_id))
+        op_id = self.find_negative_cost()
+        if op_id is not None:
+            _fail("Negative cost %d of %s." % (
+                task.operator_costs[op_id], self._operator(op_id)))
+
+    def validate_axioms(self):
+        task = self.task
+        facts = task.axiom_condition_facts
+        index = self.find_invalid_fact(facts)
+        if index is not None:
+            _fail("Condition of axiom %d contains invalid fact %s." % (
+                _get_group(task.axiom_condition_offsets, index),
+                self._fact(facts, index)))
+        index = self.find_unsorted_fact(facts, task.axiom_condition_offsets)
+        if index is not None:
+            _fail("Condition of axiom %d is not sorted by variable or "
+                  "mentions variable %d twice." % (
+                      _get_group(task.axiom_condition_offsets, index),
+                      facts[2 * index]))
+        axiom_id = self.find_invalid_fact(task.axiom_effects)
+        if axiom_id is not None:
+            _fail("Axiom %d has invalid effect %s." % (
+                axiom_id, self._fact(task.axiom_effects, axiom_id)))
+        axiom_id = self.find_axiom_on_non_derived_variable()
+        if axiom_id is not None:
+            _fail("Axiom %d changes non-derived variable %d." % (
+                axiom_id, task.axiom_effects[2 * axiom_id]))
+        index = self.find_layering_violation()
+        if index is not None:
+            _fail("Condition of axiom %d on variable %d violates the axiom "
+                  "layering." % (
+                      _get_group(task.axiom_condition_offsets, index),
+                      facts[2 * index]))
+
+
+class _PythonChecks(_Checks):
+    def _iter_facts(self, facts):
+        return enumerate(zip(facts[0::2], facts[1::2]))
+
+    def _iter_effects(self):
+        effects = self.task.effects
+        return enumerate(zip(effects[0::3], effects[1::3], effects[2::3]))
+
+    def _is_valid_fact(self, var, value):
+        ranges = self.task.ranges
+        return 0 <= var < len(ranges) and 0 <= value < ranges[var]
+
+    def find_invalid_fact(self, facts):
+        is_valid_fact = self._is_valid_fact
+        for index, (var, value) in self._iter_facts(facts):
+            if not is_valid_fact(var, value):
+                return index
+        return None
+
+    def find_unsorted_fact(self, facts, offsets, by_value=False):
+        for group in range(len(offsets) - 1):
+            for index in range(offsets[group] + 1, offsets[group + 1]):
+                last_var, last_value = facts[2 * index - 2:2 * index]
+                var, value = facts[2 * index:2 * index + 2]
+                if var < last_var or (var == last_var and (
+                        not by_value or value <= last_value)):
+                    return index
+        return None
+
+    def find_invalid_init_value(self):
+        for var, value in enumerate(self.task.init):
+            if not self._is_valid_fact(var, value):
+                return var
+        return None
+
+    def find_small_range(self):
+        for var, var_range in enumerate(self.task.ranges):
+            if var_range < 2:
+                return var
+        return None
+
+    def find_invalid_layer(self):
+        for var, layer in enumerate(self.task.axiom_layers):
+            if layer < -1:
+                return var
+        return None
+
+    def find_non_binary_derived_variable(self):
+        for var, layer in enumerate(self.task.axiom_layers):
+            if layer != -1 and self.task.ranges[var] != 2:
+                return var
+        return None
+
+    def find_non_canonical_effect(self):
+        offsets = self.task.effect_offsets
+        triples = [triple for _, triple in self._iter_effects()]
+        for op_id in range(len(offsets) - 1):
+            for eff_id in range(offsets[op_id] + 1, offsets[op_id + 1]):
+                triple = triples[eff_id]
+                last_triple = triples[eff_id - 1]
+                if triple < last_triple or (
+                        triple == last_triple and
+                        self._get_condition(eff_id) <=
+                        self._get_condition(eff_id - 1)):
+                    return eff_id
+        return None
+
+    def _get_prevail_vars(self, op_id):
+        task = self.task
+        return {task.prevail_facts[2 * i] for i in range(
+            task.prevail_offsets[op_id], task.prevail_offsets[op_id + 1])}
+
+    def find_effect_on_prevail_variable(self):
+        offsets = self.task.effect_offsets
+        effects = self.task.effects
+        for op_id in range(len(offsets) - 1):
+            prevail_vars = self._get_prevail_vars(op_id)
+            for eff_id in range(offsets[op_id], offsets[op_id + 1]):
+                if effects[3 * eff_id] in prevail_vars:
+                    return eff_id
+        return None
+
+    def find_invalid_effect(self):
+        is_valid_fact = self._is_valid_fact
+        for eff_id, (var, pre, post) in self._iter_effects():
+            if (not is_valid_fact(var, post) or
+                    (pre != -1 and not is_valid_fact(var, pre))):
+                return eff_id
+        return None
+
+    def find_derived_effect(self):
+        axiom_layers = self.task.axiom_layers
+        for eff_id, (var, _, _) in self._iter_effects():
+            if axiom_layers[var] != -1:
+                return eff_id
+        return None
+
+    def find_inconsistent_precondition(self):
+        offsets = self.task.effect_offsets
+        effects = self.task.effects
+        for op_id in range(len(offsets) - 1):
+            for eff_id in range(offsets[op_id] + 1, offsets[op_id + 1]):
+                if (effects[3 * eff_id] == effects[3 * eff_id - 3] and
+                        effects[3 * eff_id + 1] != effects[3 * eff_id - 2]):
+                    return eff_id
+        return None
+
+    def find_condition_on_precondition_variable(self):
+        task = self.task
+        for op_id in range(task.num_operators):
+            forbidden_vars = self._get_prevail_vars(op_id)
+            eff_ids = range(task.effect_offsets[op_id],
+                            task.effect_offsets[op_id + 1])
+            forbidden_vars.update(
+                task.effects[3 * eff_id] for eff_id in eff_ids
+                if task.effects[3 * eff_id + 1] != -1)
+            for eff_id in eff_ids:
+                for index in range(task.effect_condition_offsets[eff_id],
+                                   task.effect_condition_offsets[eff_id + 1]):
+                    if task.effect_condition_facts[2 * index] in \
+                            forbidden_vars:
+                        return index
+        return None
+
+    def find_operator_without_effects(self):
+        offsets = self.task.effect_offsets
+        for op_id in range(len(offsets) - 1):
+            if offsets[op_id] == offsets[op_id + 1]:
+                return op_id
+        return None
+
+    def find_negative_cost(self):
+        for op_id, cost in enumerate(self.task.operator_costs):
+            if cost < 0:
+                return op_id
+        return None
+
+    def find_axiom_on_non_derived_variable(self):
+        axiom_layers = self.task.axiom_layers
+        for axiom_id, (var, _) in self._iter_facts(self.task.axiom_effects):
+            if axiom_layers[var] < 0:
+                return axiom_id
+        return None
+
+    def find_layering_violation(self):
+        task = self.task
+        init = task.init
+        axiom_layers = task.axiom_layers
+        for axiom_id, (eff_var, eff_value) in self._iter_facts(
+                task.axiom_effects):
+            eff_layer = axiom_layers[eff_var]
+            eff_is_init = eff_value == init[eff_var]
+            for index in range(task.axiom_condition_offsets[axiom_id],
+                               task.axiom_condition_offsets[axiom_id + 1]):
+                var = task.axiom_condition_facts[2 * index]
+                value = task.axiom_condition_facts[2 * index + 1]
+                layer = axiom_layers[var]
+                if layer > eff_layer or (
+                        layer == eff_layer and
+                        (value == init[var]) != eff_is_init):
+                    return index
+        return None
+
+
+def _first(mask):
+    indices = numpy.flatnonzero(mask)
+    return int(indices[0]) if len(indices) else None
+
+
+class _NumpyChecks(_Checks):
+    def __init__(self, task):
+        super().__init__(task)
+        self.ranges = self._as_numpy(task.ranges)
+        self.axiom_layers = self._as_numpy(task.axiom_layers)
+        self.init = self._as_numpy(task.init)
+        effects = self._as_numpy(task.effects)
+        self.effect_vars = effects[0::3]
+        self.effect_pres = effects[1::3]
+        self.effect_posts = effects[2::3]
+        # Operator of each effect, operator of each prevail condition, and
+        # effect of each effect condition.
+        self.effect_ops = self._get_groups(task.effect_offsets)
+        self.prevail_ops = self._get_groups(task.prevail_offsets)
+        self.condition_effects = self._get_groups(
+            task.effect_condition_offsets)
+
+    def _as_numpy(self, values):
+        # Use 64-bit integers so combined keys below cannot overflow.
+        return numpy.asarray(values, dtype=numpy.int64)
+
+    def _get_groups(self, offsets):
+        offsets = self._as_numpy(offsets)
+        return numpy.repeat(numpy.arange(len(offsets) - 1),
+                            numpy.diff(offsets))
+
+    def _split_facts(self, facts):
+        facts = self._as_numpy(facts)
+        return facts[0::2], facts[1::2]
+
+    def _get_ranges(self, variables):
+        # Return the range of each variable, or 0 for invalid variables.
+        valid = (variables >= 0) & (variables < len(self.ranges))
+        padded_ranges = numpy.append(self.ranges, 0)
+        return padded_ranges[numpy.where(valid, variables, len(self.ranges))]
+
+    def _get_var_keys(self, groups, variables):
+        # Combine group and variable into a single key. Invalid variables
+        # would collide with variables of neighboring groups, so they get
+        # the key -1 instead, which _find_shared_key never matches.
+        valid = (variables >= 0) & (variables < len(self.ranges))
+        return numpy.where(valid, groups * len(self.ranges) + variables, -1)
+
+    def _find_shared_key(self, keys, other_keys):
+        return _first((keys >= 0) & numpy.isin(keys, other_keys))
+
+    def _is_valid_fact(self, variables, values):
+        return (values >= 0) & (values < self._get_ranges(variables))
+
+    def find_invalid_fact(self, facts):
+        return _first(~self._is_valid_fact(*self._split_facts(facts)))
+
+    def find_unsorted_fact(self, facts, offsets, by_value=False):
+        variables, values = self._split_facts(facts)
+        groups = self._get_groups(offsets)
+        var_diff = variables[1:] - variables[:-1]
+        unsorted = var_diff < 0
+        if by_value:
+            unsorted |= (var_diff == 0) & (values[1:] <= values[:-1])
+        else:
+            unsorted |= var_diff == 0
+        index = _first(unsorted & (groups[1:] == groups[:-1]))
+        return None if index is None else index + 1
+
+    def find_invalid_init_value(self):
+        variables = numpy.arange(len(self.init))
+        return _first(~self._is_valid_fact(variables, self.init))
+
+    def find_small_range(self):
+        return _first(self.ranges < 2)
+
+    def find_invalid_layer(self):
+        return _first(self.axiom_layers < -1)
+
+    def find_non_binary_derived_variable(self):
+        return _first((self.axiom_layers != -1) & (self.ranges != 2))
+
+    def find_non_canonical_effect(self):
+        variables = self.effect_vars
+        pres = self.effect_pres
+        posts = self.effect_posts
+        same_op = self.effect_ops[1:] == self.effect_ops[:-1]
+        # Compare the (var, pre, post) part of consecutive effects
+        # lexicographically: -1, 0, or 1 if the first differing component
+        # decreases, all are equal, or it increases.
+        comparison = numpy.zeros(len(variables) - 1 if len(variables) else 0,
+                                 dtype=numpy.int64)
+        for column in (posts, pres, variables):
+            diff = numpy.sign(column[1:] - column[:-1])
+            comparison = numpy.where(diff != 0, diff, comparison)
+        candidates = numpy.flatnonzero(same_op & (comparison <= 0))
+        for index in candidates:
+            eff_id = int(index) + 1
+            if comparison[index] < 0:
+                return eff_id
+            # Only effects with identical (var, pre, post) need a comparison
+            # of their effect conditions, which is rare enough to do in
+            # Python.
+            if (self._get_condition(eff_id) <=
+                    self._get_condition(eff_id - 1)):
+                return eff_id
+        return None
+
+    def _get_prevail_keys(self):
+        prevail_vars, _ = self._split_facts(self.task.prevail_facts)
+        return self._get_var_keys(self.prevail_ops, prevail_vars)
+
+    def find_effect_on_prevail_variable(self):
+        effect_keys = self._get_var_keys(self.effect_ops, self.effect_vars)
+        return self._find_shared_key(effect_keys, self._get_prevail_keys())
+
+    def find_invalid_effect(self):
+        return _first(
+            ~self._is_valid_fact(self.effect_vars, self.effect_posts) |
+            ((self.effect_pres != -1) &
+             ~self._is_valid_fact(self.effect_vars, self.effect_pres)))
+
+    def find_derived_effect(self):
+        return _first(self.axiom_layers[self.effect_vars] != -1)
+
+    def find_inconsistent_precondition(self):
+        index = _first(
+            (self.effect_ops[1:] == self.effect_ops[:-1]) &
+            (self.effect_vars[1:] == self.effect_vars[:-1]) &
+            (self.effect_pres[1:] != self.effect_pres[:-1]))
+        return None if index is None else index + 1
+
+    def find_condition_on_precondition_variable(self):
+        has_pre = self.effect_pres != -1
+        forbidden_keys = numpy.concatenate((
+            self._get_prevail_keys(),
+            self._get_var_keys(self.effect_ops[has_pre],
+                               self.effect_vars[has_pre])))
+        condition_vars, _ = self._split_facts(
+            self.task.effect_condition_facts)
+        condition_keys = self._get_var_keys(
+            self.effect_ops[self.condition_effects], condition_vars)
+        return self._find_shared_key(condition_keys, forbidden_keys)
+
+    def find_operator_without_effects(self):
+        return _first(numpy.diff(self._as_numpy(self.task.effect_offsets)) ==
+                      0)
+
+    def find_negative_cost(self):
+        return _first(self._as_numpy(self.task.operator_costs) < 0)
+
+    def find_axiom_on_non_derived_variable(self):
+        effect_vars, _ = self._split_facts(self.task.axiom_effects)
+        return _first(self.axiom_layers[effect_vars] < 0)
+
+    def find_layering_violation(self):
+        effect_vars, effect_values = self._split_facts(
+            self.task.axiom_effects)
+        effect_is_init = effect_values == self.init[effect_vars]
+        axioms = self._get_groups(self.task.axiom_condition_offsets)
+        variables, values = self._split_facts(
+            self.task.axiom_condition_facts)
+        layers = self.axiom_layers[variables]
+        effect_layers = self.axiom_layers[effect_vars][axioms]
+        return _first(
+            (layers > effect_layers) |
+            ((layers == effect_layers) &
+             ((values == self.init[variables]) != effect_is_init[axioms])))
@@ -1,9 +1,10 @@
+import itertools
 import logging
 from pathlib import Path
 
 from machetli.environments import LocalEnvironment, EvaluationTask
 from machetli.errors import SubmissionError, PollingError
-from machetli.successors import make_single_successor_generator
+from machetli.successors import make_single_successor_generator, KEY_RUN_DIR
 from machetli.tools import batched, configure_logging
 
 
@@ -53,7 +54,10 @@ def search(initial_state, successor_generator, evaluator_path, environment=None,
         successor even if it would not have come first in a sequential order. If
         the order of the successor generators is important in your case, you can
         force a deterministic order. The search then simulates sequential
-        execution.
+        execution. Speculative evaluation (see the option
+        `speculative_batch_size` of :class:`Environment
+        <machetli.environments.Environment>`) and evaluating successors with
+        large size reductions first are only used in non-deterministic mode.
 
     :return: the last state where the evaluator was successful, i.e., all
         successors of the resulting state no longer have the evaluated property.
@@ -107,12 +111,16 @@ def search(initial_state, successor_generator, evaluator_path, environment=None,
     logging.info("Starting search ...")
     left_initial_state = False
     current_state = initial_state
+    speculation = None
     while True:
         environment.start_new_iteration()
-        successors = successor_generator.get_successors(current_state)
+        if speculation is None:
+            speculation = _Speculation(
+                successor_generator.get_successors(current_state))
         try:
-            improving_state, message = _get_improving_successor(
-                Path(evaluator_path), successors, environment, deterministic)
+            improving_state, message, speculation = _get_improving_successor(
+                Path(evaluator_path), speculation, successor_generator,
+                environment, deterministic)
         except SubmissionError as e:
             logging.critical(f"Terminating search because job submission for successor evaluation failed:\n{e}")
         except PollingError as e:
@@ -145,10 +153,61 @@ def _evaluate_initial_state(evaluator_path, environment, deterministic):
         logging.info("Confirmed that the behavior is present in the initial state.")
 
 
-def _get_improving_successor(evaluator_path, successors, environment, deterministic):
+def _prioritize(batch):
+    # Evaluate successors with larger size reductions first. Batches are
+    # only reordered if all successors in them know their size reduction,
+    # so the order chosen by generators without this information is kept.
+    if all(successor.size_reduction is not None for successor in batch):
+        batch = tuple(sorted(batch, key=lambda successor: -successor.size_reduction))
+    return batch
+
+
+class _Speculation:
+    """
+    Successors of a state whose evaluation may already have been started
+    speculatively in *job* for the first few of them. The remaining successors
+    are generated on demand from *successors*.
+    """
+    def __init__(self, successors, job=None):
+        self.successors = successors
+        self.job = job
+
+
+def _get_improving_successor(evaluator_path, speculation, successor_generator,
+                             environment, deterministic):
     tasks_out_of_resources = set()
-    for batch in batched(successors, environment.batch_size):
-        task_ids = list(range(len(batch)))
+    # Speculations started for improving successors, indexed by run directory.
+    speculations = {}
+
+    def speculate(task):
+        state = task.successor.state
+        state[KEY_RUN_DIR] = task.run_dir
+        successors = successor_generator.get_successors(state)
+        batch = _prioritize(tuple(itertools.islice(
+            successors, environment.speculative_batch_size)))
+        job = None
+        if batch:
+            job = environment.speculate(evaluator_path, batch)
+        speculations[task.run_dir] = _Speculation(successors, job)
+
+    def cancel_speculations(except_run_dir=None):
+        for run_dir, other in speculations.items():
+            if run_dir != except_run_dir and other.job is not None:
+                environment.cancel(other.job)
+
+    batches = batched(speculation.successors, environment.batch_size)
+    if not deterministic:
+        # Reordering would make the result depend on the batch size.
+        batches = map(_prioritize, batches)
+    if speculation.job is not None:
+        logging.info(f"Using {len(speculation.job.tasks)} speculatively "
+                     f"started evaluations.")
+        batches = itertools.chain([speculation.job], batches)
+
+    for batch in batches:
+        is_speculative_job = batch is speculation.job
+        task_ids = list(range(
+            len(batch.tasks) if is_speculative_job else len(batch)))
         def on_task_completed(task):
             if (deterministic and task.status !=
                     EvaluationTask.DONE_AND_BEHAVIOR_NOT_PRESENT):
@@ -160,22 +219,34 @@ def _get_improving_successor(evaluator_path, successors, environment, determinis
                 # We found an improving successor, so all other evaluations can
                 # be canceled.
                 task_ids_to_cancel = task_ids
+                if environment.speculative_batch_size > 0:
+                    speculate(task)
             else:
                 task_ids_to_cancel = None
             return task_ids_to_cancel
 
-        tasks = environment.run(evaluator_path, batch, on_task_completed)
+        if is_speculative_job:
+            tasks = environment.resume(batch, on_task_completed)
+        else:
+            tasks = environment.run(evaluator_path, batch, on_task_completed)
         for task in tasks:
             if task.status == EvaluationTask.DONE_AND_BEHAVIOR_NOT_PRESENT:
                 continue
             elif task.status == EvaluationTask.DONE_AND_BEHAVIOR_PRESENT:
-                return task.successor.state, task.successor.change_msg
+                task.successor.state[KEY_RUN_DIR] = task.run_dir
+                cancel_speculations(except_run_dir=task.run_dir)
+                next_speculation = speculations.get(task.run_dir)
+                message = task.successor.change_msg
+                if task.successor.size_reduction is not None:
+                    message += (f" Size reduced by "
+                                f"{task.successor.size_reduction}.")
+                return task.successor.state, message, next_speculation
             elif task.status == EvaluationTask.OUT_OF_RESOURCES:
                 if deterministic:
                     return None, (task.error_msg +
                         "\nAn evaluator ran out of resources. With the option "
                         "'deterministic' an improving successor found later "
-                        "would not count.")
+                        "would not count."), None
                 else:
                     tasks_out_of_resources.add(task)
             elif task.status == EvaluationTask.CRITICAL:
@@ -183,7 +254,7 @@ def _get_improving_successor(evaluator_path, successors, environment, determinis
                     return None, (task.error_msg +
                         "\nA critical error occurred in an evaluator. With the "
                         "option 'deterministic' an improving successor found "
-                        "later would not count.")
+                        "later would not count."), None
                 else:
                     logging.warning(f"{task.error_msg}\nCritical error in "
                                     f"'{task.run_dir}'")
@@ -200,4 +271,4 @@ def _get_improving_successor(evaluator_path, successors, environment, determinis
         message += (
             f" Note that the following tasks ran out of resources and thus"
             f" could not successfully be checked:\n{run_dirs_str}")
-    return None, message
+    return None, message, None
@@ -0,0 +1,199 @@
+r"""
+State codecs define how states are stored in the run directories of an
+:class:`Environment <machetli.environments.Environment>` and read again by
+the evaluator. Each codec is identified by the suffix of the files it
+writes, so :meth:`tools.read_state <machetli.tools.read_state>` can select
+the right codec for a given file. By default, states are pickled with
+:class:`PickleCodec`.
+
+For large tasks, writing and reading states can take a considerable part
+of the time of each evaluation. :class:`OutOfBandPickleCodec` writes the
+integer arrays of array-backed tasks like :class:`CompactSASTask
+<machetli.sas.compact_tasks.CompactSASTask>` directly to the file instead of
+copying them into the pickle stream, and :class:`SASCodec` stores
+SAS\ :sup:`+` tasks in a custom binary format. The script
+``examples/benchmarks/state_codecs.py`` compares the codecs on a given
+SAS\ :sup:`+` file.
+
+Custom codecs can be added by subclassing :class:`StateCodec` and adding
+an instance with :meth:`register_state_codec`. Since the evaluator runs in
+its own process, the evaluator script has to register the codec as well.
+"""
+from array import array
+import pickle
+import struct
+
+
+class StateCodec:
+    """
+    Abstract base class of all state codecs. Concrete codecs have to set
+    :attr:`suffix` and implement :meth:`write` and :meth:`read`.
+    """
+
+    suffix = None
+    """
+    Suffix (including the leading dot) of files written with this codec.
+    """
+
+    def write(self, state, file):
+        """
+        Write *state* to the binary file object *file*.
+        """
+        raise NotImplementedError
+
+    def read(self, file):
+        """
+        Read a state written with :meth:`write` from the binary file object
+        *file* and return it.
+        """
+        raise NotImplementedError
+
+
+class PickleCodec(StateCodec):
+    """
+    Pickle the complete state with the given pickle *protocol*.
+    """
+    suffix = ".pickle"
+
+    def __init__(self, protocol=pickle.DEFAULT_PROTOCOL):
+        self.protocol = protocol
+
+    def write(self, state, file):
+        pickle.dump(state, file, protocol=self.protocol)
+
+    def read(self, file):
+        return pickle.load(file)
+
+
+def _write_uint64(file, value):
+    file.write(struct.pack("<Q", value))
+
+
+def _read_uint64(file):
+    return struct.unpack("<Q", file.read(8))[0]
+
+
+def _read_exactly(file, num_bytes):
+    buffer = bytearray(num_bytes)
+    view = memoryview(buffer)
+    position = 0
+    while position < num_bytes:
+        # Decompressing file objects may return fewer bytes than requested.
+        num_read = file.readinto(view[position:])
+        if not num_read:
+            raise EOFError("State file ended unexpectedly.")
+        position += num_read
+    return buffer
+
+
+class OutOfBandPickleCodec(StateCodec):
+    """
+    Pickle the state with protocol 5 and write the buffers of objects that
+    support out-of-band pickling (like :class:`CompactSASTask
+    <machetli.sas.compact_tasks.CompactSASTask>`) directly to the file after
+    the pickled data. This avoids copying large arrays into the pickle
+    stream when writing and out of it when reading.
+    """
+    suffix = ".pickle5"
+
+    def write(self, state, file):
+        buffers = []
+        data = pickle.dumps(state, protocol=5,
+                            buffer_callback=buffers.append)
+        raw_buffers = [buffer.raw() for buffer in buffers]
+        _write_uint64(file, len(raw_buffers))
+        _write_uint64(file, len(data))
+        for raw in raw_buffers:
+            _write_uint64(file, raw.nbytes)
+        file.write(data)
+        for raw in raw_buffers:
+            file.write(raw)
+
+    def read(self, file):
+        num_buffers = _read_uint64(file)
+        data_size = _read_uint64(file)
+        buffer_sizes = [_read_uint64(file) for _ in range(num_buffers)]
+        data = _read_exactly(file, data_size)
+        buffers = [_read_exactly(file, size) for size in buffer_sizes]
+        return pickle.loads(data, buffers=buffers)
+
+
+class SASCodec(StateCodec):
+    r"""
+    Store states containing SAS\ :sup:`+` tasks in a custom binary format:
+    all integer data of the task is written as raw arrays in the format of
+    :class:`CompactSASTask <machetli.sas.compact_tasks.CompactSASTask>`, and
+    only names and the remaining entries of the state are pickled. Regular
+    :class:`SASTask <machetli.sas.sas_tasks.SASTask>` objects are converted
+    to compact tasks for writing and back when reading.
+
+    The arrays are written in the byte order of the machine, so files
+    cannot be moved between machines with a different byte order.
+    """
+    suffix = ".sasbin"
+
+    def write(self, state, file):
+        # Import here to only load the SAS+ package when it is used.
+        from machetli.sas.compact_tasks import CompactSASTask, ARRAY_FIELDS
+        from machetli.sas.constants import KEY_IN_STATE
+        task = state[KEY_IN_STATE]
+        is_compact = isinstance(task, CompactSASTask)
+        if not is_compact:
+            task = CompactSASTask.from_task(task)
+        other_entries = {key: value for key, value in state.items()
+                         if key != KEY_IN_STATE}
+        header = pickle.dumps({
+            "state": other_entries,
+            "is_compact": is_compact,
+            "value_names": task.value_names,
+            "operator_names": task.operator_names,
+            "metric": task.metric,
+            "encoding_size": task._encoding_size,
+            "array_sizes": [len(getattr(task, field))
+                            for field in ARRAY_FIELDS],
+        }, protocol=pickle.HIGHEST_PROTOCOL)
+        _write_uint64(file, len(header))
+        file.write(header)
+        for field in ARRAY_FIELDS:
+            file.write(getattr(task, field))
+
+    def read(self, file):
+        from machetli.sas.compact_tasks import CompactSASTask, ARRAY_FIELDS, \
+            INT_TYPECODE
+        from machetli.sas.constants import KEY_IN_STATE
+        header = pickle.loads(_read_exactly(file, _read_uint64(file)))
+        arrays = {}
+        for field, size in zip(ARRAY_FIELDS, header["array_sizes"]):
+            values = array(INT_TYPECODE)
+            values.frombytes(_read_exactly(file, size * values.itemsize))
+            arrays[field] = values
+        task = CompactSASTask(
+            value_names=header["value_names"],
+            operator_names=header["operator_names"],
+            metric=header["metric"], **arrays)
+        task._encoding_size = header["encoding_size"]
+        if not header["is_compact"]:
+            task = task.to_task()
+        state = header["state"]
+        state[KEY_IN_STATE] = task
+        return state
+
+
+STATE_CODECS = {}
+"""
+Registered state codecs by their suffix.
+"""
+
+
+def register_state_codec(codec: StateCodec):
+    """
+    Register *codec* so :meth:`tools.read_state <machetli.tools.read_state>`
+    and :meth:`tools.write_state <machetli.tools.write_state>` use it for
+    files with its suffix.
+    """
+    STATE_CODECS[codec.suffix] = codec
+
+
+for _codec in [PickleCodec(), OutOfBandPickleCodec(), SASCodec()]:
+    register_state_codec(_codec)
+del _codec
@@ -10,6 +10,7 @@ generators for PDDL and SAS\ :sup:`+` files are implemented in the packages
 :ref:`extending Machetli<extending-machetli>`.
 """
 
+from pathlib import Path
 import random
 
 
@@ -20,11 +21,101 @@ generators. Using a fixed seed here makes the order of generated successors
 reproducible.
 """
 
+ORDER_RANDOM = "random"
+"""
+Order option for successor generators that tries candidate modifications in
+random order (using :attr:`RNG`).
+"""
+
+ORDER_LARGEST_FIRST = "largest_first"
+"""
+Order option for successor generators that tries candidate modifications with
+the largest estimated size reduction first. Committing to large reductions
+early makes later iterations of the search work on smaller instances.
+"""
+
+KEY_RUN_DIR = "run_dir"
+"""
+Key under which the search stores the run directory of a state in the state
+when it commits to the state. Successor generators can use this to access
+files that the evaluator wrote while evaluating the state, for example a plan.
+"""
+
 
 class Successor:
-    def __init__(self, state, msg):
+    """
+    A *state* generated by a successor generator together with a message
+    *msg* describing the change. If the generator knows by how much the
+    change reduces the size of the instance, it can pass this as
+    *size_reduction*, so the search can report progress. If all successors
+    in a batch have a size reduction, the search evaluates those with large
+    reductions first, unless it runs in deterministic mode.
+    """
+    def __init__(self, state, msg, size_reduction=None):
         self.state = state
         self.change_msg = msg
+        self.size_reduction = size_reduction
+
+
+def get_run_dir_path(state, filename):
+    """
+    Return the path to the file *filename* in the run directory in which
+    *state* was evaluated. Return ``None`` if the state was not evaluated by the
+    search (e.g., for the initial state) or the file does not exist.
+    """
+    run_dir = state.get(KEY_RUN_DIR)
+    if run_dir is None:
+        return None
+    path = Path(run_dir) / filename
+    if not path.exists():
+        return None
+    return path
+
+
+def get_bisection_chunks(items):
+    """
+    Yield consecutive chunks of the list *items* with decreasing size: first
+    all items, then both halves, then all quarters, and so on until every
+    item forms its own chunk. Successor generators can use this to try
+    removing large parts of an instance first, so that an instance with *n*
+    removable elements can often be reduced with a logarithmic number of
+    evaluations.
+    """
+    chunk_size = len(items)
+    # The last chunk of one size can be the same as a chunk of the next size.
+    yielded_bounds = set()
+    while chunk_size > 0:
+        for start in range(0, len(items), chunk_size):
+            end = min(start + chunk_size, len(items))
+            if (start, end) not in yielded_bounds:
+                yielded_bounds.add((start, end))
+                yield items[start:end]
+        if chunk_size == 1:
+            break
+        chunk_size = (chunk_size + 1) // 2
+
+
+def check_order(order):
+    """
+    Raise a ValueError if *order* is not :attr:`ORDER_RANDOM` or
+    :attr:`ORDER_LARGEST_FIRST`. Successor generators call this in their
+    constructor, so a wrong option is reported before the search starts.
+    """
+    if order not in (ORDER_RANDOM, ORDER_LARGEST_FIRST):
+        raise ValueError(f"Unknown order '{order}'.")
+
+
+def order_candidates(candidates, order, get_estimated_reduction):
+    """
+    Sort the list *candidates* in place according to *order*, which has to be
+    :attr:`ORDER_RANDOM` or :attr:`ORDER_LARGEST_FIRST`. For the latter, the
+    function *get_estimated_reduction* is called for each candidate and
+    candidates with larger values come first. Ties are broken randomly.
+    """
+    check_order(order)
+    RNG.shuffle(candidates)
+    if order == ORDER_LARGEST_FIRST:
+        candidates.sort(key=get_estimated_reduction, reverse=True)
 
 
 class SuccessorGenerator:
@@ -2,11 +2,13 @@
 This module is derived from ``tools.py`` of Lab (<https://lab.readthedocs.io>).
 Functions and classes that are not needed for this project were removed.
 """
+import bz2
 from contextlib import contextmanager
+import gzip
 import itertools
 import logging
+import lzma
 from pathlib import Path
-import pickle
 import re
 import resource
 import shutil
@@ -14,9 +16,21 @@ import subprocess
 import sys
 from typing import Union
 
+from machetli.state_codecs import STATE_CODECS, PickleCodec
+
 
 DEFAULT_ENCODING = "utf-8"
 
+COMPRESSION_FORMATS = {
+    "gz": gzip,
+    "bz2": bz2,
+    "xz": lzma,
+}
+"""
+Supported compression formats, identified by the file suffix (without the
+leading dot) that selects them automatically.
+"""
+
 
 # From https://docs.python.org/3/library/itertools.html#itertools-recipes
 def batched(iterable, n):
@@ -106,18 +120,96 @@ def configure_logging(level=logging.INFO):
     root_logger.setLevel(level)
 
 
-def write_state(state, file_path: Union[Path, str]):
+def get_compression(file_path: Union[Path, str]):
+    """
+    Return the compression format of *file_path* (one of the keys of
+    :attr:`COMPRESSION_FORMATS`) based on its suffix, or ``None`` if the
+    suffix does not belong to a compression format.
+    """
+    compression = Path(file_path).suffix[1:]
+    return compression if compression in COMPRESSION_FORMATS else None
+
+
+def open_file(file_path: Union[Path, str], mode="r", compression=None,
+              **kwargs):
+    """
+    Open *file_path* like :func:`open` but transparently decompress the file
+    while reading it and compress it while writing. Reading and writing is
+    streamed, so the uncompressed content is never held in memory completely.
+
+    :param compression: one of the keys of :attr:`COMPRESSION_FORMATS`. By
+        default, the compression format is selected based on the suffix of
+        *file_path* (see :meth:`get_compression`), and files with other
+        suffixes are not compressed.
+    :param kwargs: are passed on to the function opening the file, e.g., to
+        specify an ``encoding``.
     """
-    Use pickle to write a given state to disk.
+    if compression is None:
+        compression = get_compression(file_path)
+    if compression is None:
+        return Path(file_path).open(mode, **kwargs)
+    if compression not in COMPRESSION_FORMATS:
+        raise ValueError(
+            f"Unknown compression format '{compression}'. Supported formats "
+            f"are {', '.join(COMPRESSION_FORMATS)}.")
+    if "b" not in mode and "t" not in mode:
+        # Unlike open, the compression modules default to binary mode.
+        mode += "t"
+    return COMPRESSION_FORMATS[compression].open(file_path, mode, **kwargs)
+
+
+def _get_state_codec(file_path):
+    path = Path(file_path)
+    if get_compression(path):
+        path = path.with_suffix("")
+    return STATE_CODECS.get(path.suffix, PickleCodec())
+
+
+def write_state(state, file_path: Union[Path, str], compression=None,
+                codec=None):
     """
-    Path(file_path).write_bytes(pickle.dumps(state))
+    Write a given state to disk. By default, the
+    :mod:`state codec <machetli.state_codecs>` is selected based on the suffix
+    of *file_path*, and pickle is used for unknown suffixes. If *file_path*
+    ends in the suffix of a compression format, the state is compressed (see
+    :meth:`open_file`). Since :meth:`read_state` selects the compression
+    format based on the suffix, *compression* must match it if it is given.
+    """
+    if compression is not None and compression != get_compression(file_path):
+        raise ValueError(
+            f"Compression format '{compression}' does not match the suffix "
+            f"of '{file_path}'. Use the suffix '.{compression}' instead.")
+    codec = codec or _get_state_codec(file_path)
+    with open_file(file_path, "wb", compression) as file:
+        codec.write(state, file)
 
 
 def read_state(file_path: Union[Path, str]):
     """
-    Use pickle to read a state from disk.
+    Read a state from disk. The :mod:`state codec <machetli.state_codecs>` and
+    compression format are selected based on the suffixes of *file_path*
+    like in :meth:`write_state`.
+    """
+    with open_file(file_path, "rb") as file:
+        return _get_state_codec(file_path).read(file)
+
+
+def read_plan(file_path: Union[Path, str]):
+    """
+    Read a plan in the format written by Fast Downward (one action per line,
+    enclosed in parentheses, and comments starting with ``;``) and return the
+    list of action names without parentheses. Whitespace within action names is
+    normalized to single spaces.
     """
-    return pickle.loads(Path(file_path).read_bytes())
+    plan = []
+    for line in Path(file_path).read_text().splitlines():
+        line = line.strip()
+        if not line or line.startswith(";"):
+            continue
+        if line.startswith("(") and line.endswith(")"):
+            line = line[1:-1]
+        plan.append(" ".join(line.split()))
+    return plan
 
 
 def parse(content, pattern, type=int):
@@ -40,6 +40,9 @@ setup(
     packages=find_packages(),
     python_requires=">=3.7",
     install_requires = ["questionary >= 2.1.0", "CT3 >= 3.4"],
+    extras_require={
+        "numpy": ["numpy"],
+    },
     include_package_data=True,
     package_data={
         "machetli": [